@@ -1,21 +1,67 @@
+import time
+import inspect
 import sqlite3
 import functools
 from datetime import datetime
+from query_log import logger, record_query, start_logging
+
+def find_query(args, kwargs):
+    # Extract the query form the kwargs or args
+    query = kwargs.get('query', None)
+    if query is None and args:
+        query = args[0] if len(args) >= 1 else None
+    params = kwargs.get('params', None)
+    if params is None and len(args) > 1:
+        params = args[1]
+    return query, params
+
+def log_queries(func=None, *, sample_rate=None, slow_ms=None):
+    """Decorator that logs the SQL queries executed by the function.
+
+    Each call produces a structured record (fingerprint, params count,
+    duration, rows returned) written by a background thread. Queries
+    slower than slow_ms, and failures, are always logged; the rest only
+    for a sample_rate fraction of calls. Every call is counted in the
+    per-fingerprint totals of query_stats.
+    """
+    if func is None:
+        return lambda f: log_queries(f, sample_rate=sample_rate, slow_ms=slow_ms)
+    if not logger.handlers:
+        start_logging()
+
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            query, params = find_query(args, kwargs)
+            if query is None:
+                return await func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                result = await func(*args, **kwargs)
+            except Exception as e:
+                record_query(query, params, time.perf_counter() - start, error=e)
+                raise
+            record_query(query, params, time.perf_counter() - start, result, None, sample_rate, slow_ms)
+            return result
+        return async_wrapper
 
-def log_queries(func):
-    """Decorator that logs the SQL queries executed by the function."""
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        # Extract the query form the kwargs or args
-        query = kwargs.get('query', None)
-        if query is None and args:
-            query = args[0] if len(args) >= 1 else None
+        query, params = find_query(args, kwargs)
+        if query is None:
+            return func(*args, **kwargs)
 
-        # log the query
-        print(f'Executing query: {query}')
+        # call the original function, timing it
+        start = time.perf_counter()
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            record_query(query, params, time.perf_counter() - start, error=e)
+            raise
 
-        # call the original function
-        return func(*args, **kwargs)
+        # log the query
+        record_query(query, params, time.perf_counter() - start, result, None, sample_rate, slow_ms)
+        return result
     return wrapper
 
 @log_queries
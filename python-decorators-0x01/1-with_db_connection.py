@@ -1,22 +1,34 @@
-import sqlite3
+import inspect
 import functools
+from sqlite_pool import aborrow, borrow, is_connection
+
+def with_db_connection(func=None, *, pool=None):
+    # @with_db_connection(pool=True) borrows from the shared pool for
+    # users.db instead of opening a new connection per call
+    if func is None:
+        return lambda f: with_db_connection(f, pool=pool)
+
+    if inspect.iscoroutinefunction(func):
+        # coroutine functions get an aiosqlite connection (not pooled)
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            async with aborrow() as conn:
+                if 'conn' not in kwargs and not (len(args) > 0 and is_connection(args[0])):
+                    kwargs['conn'] = conn
+                return await func(*args, **kwargs)
+        return async_wrapper
 
-def with_db_connection(func):
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        # open the database connection
-        conn = sqlite3.connect('users.db')
-        try:
+        # open (or borrow) the database connection
+        with borrow(pool) as conn:
             # pass the connection as the first argument if not already provided
-            if 'conn' not in kwargs and not (len(args) > 0 and isinstance(args[0], sqlite3.Connection)):
+            if 'conn' not in kwargs and not (len(args) > 0 and is_connection(args[0])):
                 kwargs['conn'] = conn
 
             # call the original function
             result = func(*args, **kwargs)
             return result
-        
-        finally:
-            conn.close()
     return wrapper
 
 @with_db_connection
@@ -1,36 +1,66 @@
-import sqlite3
+import inspect
 import functools
+from query_dependencies import atrack_writes, track_writes, invalidate_tables
+from sqlite_pool import aborrow, borrow, is_connection
+
+def with_db_connection(func=None, *, pool=None):
+    if func is None:
+        return lambda f: with_db_connection(f, pool=pool)
+
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            async with aborrow() as conn:
+                if 'conn' not in kwargs and not (len(args) > 0 and is_connection(args[0])):
+                    kwargs['conn'] = conn
+                return await func(*args, **kwargs)
+        return async_wrapper
 
-def with_db_connection(func):
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        conn = sqlite3.connect('users.db')
-        try:
-            if 'conn' not in kwargs and not (len(args) > 0 and isinstance(args[0], sqlite3.Connection)):
+        with borrow(pool) as conn:
+            if 'conn' not in kwargs and not (len(args) > 0 and is_connection(args[0])):
                 kwargs['conn'] = conn
             return func(*args, **kwargs)
-        finally:
-            conn.close()
     return wrapper
 
+def find_connection(args, kwargs):
+    for arg in args:
+        if is_connection(arg):
+            return arg
+    conn = kwargs.get('conn')
+    if conn is None:
+        raise ValueError('No database connection provided')
+    return conn
+
 def transactional(func):
-    @functools.warps(func)
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            conn = find_connection(args, kwargs)
+            try:
+                async with atrack_writes(conn) as written:
+                    result = await func(*args, **kwargs)
+                await conn.commit()
+                invalidate_tables(written)
+                return result
+            except BaseException:
+                # also undo the work of a cancelled task
+                await conn.rollback()
+                raise
+        return async_wrapper
+
+    @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        conn = None
-        
-        for arg in args:
-            if isinstance(arg, sqlite3.Connection):
-                conn = arg
-                break
-        if conn is None:
-            conn = kwargs.get('conn')
-
-        if conn is None:
-            raise ValueError('No database connection provided')
-            
+        conn = find_connection(args, kwargs)
+
         try:
-            result = func(*args, **kwargs)
+            # note which tables the function writes so cached reads of
+            # them can be dropped once the changes are committed
+            with track_writes(conn) as written:
+                result = func(*args, **kwargs)
             conn.commit()
+            invalidate_tables(written)
             return result
         except Exception as e:
             conn.rollback()
@@ -1,37 +1,149 @@
 import time
+import asyncio
+import random
+import inspect
 import sqlite3
+import threading
 import functools
 from functools import wraps
+from collections import Counter
+from sqlite_pool import aborrow, borrow, is_connection
+
+def with_db_connection(func=None, *, pool=None):
+    if func is None:
+        return lambda f: with_db_connection(f, pool=pool)
+
+    if inspect.iscoroutinefunction(func):
+        @wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            async with aborrow() as conn:
+                if 'conn' not in kwargs and not (len(args) > 0 and is_connection(args[0])):
+                    kwargs['conn'] = conn
+                return await func(*args, **kwargs)
+        return async_wrapper
 
-def with_db_connection(func):
     @wraps(func)
     def wrapper(*args, **kwargs):
-        conn = sqlite3.connect('users.db')
-        try:
-            if 'conn' not in kwargs and not (len(args) > 0 and isinstance(args[0], sqlite3.Connection)):
+        with borrow(pool) as conn:
+            if 'conn' not in kwargs and not (len(args) > 0 and is_connection(args[0])):
                 kwargs['conn'] = conn
             return func(*args, **kwargs)
-        finally:
-            conn.close()
     return wrapper
 
-def retry_on_failure(retries=3, delay=2):
+# OperationalError messages that clear up once another connection lets go
+TRANSIENT_ERRORS = ('database is locked', 'database table is locked', 'database is busy')
+
+def is_retryable(error):
+    """True for lock contention; missing tables, bad SQL, corrupt files etc. won't fix themselves."""
+    return isinstance(error, sqlite3.OperationalError) and any(
+        message in str(error).lower() for message in TRANSIENT_ERRORS)
+
+class RetryBudget:
+    """Token bucket shared by every retrying call.
+
+    Each retry spends a token; tokens come back at `rate` per second up
+    to `capacity`. When the bucket is empty calls fail instead of
+    retrying, so a locked database is not hammered by a retry storm.
+    """
+
+    def __init__(self, rate=10, capacity=50):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def try_spend(self):
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+# Process-wide budget used unless a decorator is given its own
+retry_budget = RetryBudget()
+
+# attempts_per_call maps attempts made -> number of calls that needed that many
+retry_stats = {'calls': 0, 'retries': 0, 'failures': 0, 'permanent_errors': 0,
+               'budget_exhausted': 0, 'attempts_per_call': Counter()}
+_stats_lock = threading.Lock()
+
+def _record(attempts, outcome=None):
+    with _stats_lock:
+        retry_stats['calls'] += 1
+        retry_stats['retries'] += attempts - 1
+        retry_stats['attempts_per_call'][attempts] += 1
+        if outcome:
+            retry_stats[outcome] += 1
+
+def backoff(attempt, delay, max_delay):
+    """Full jitter: a random sleep up to delay * 2**attempt, capped at max_delay."""
+    return random.uniform(0, min(max_delay, delay * 2 ** attempt))
+
+def _next_pause(error, attempt, waited, retries, delay, max_delay, max_wait, tokens):
+    """Return how long to sleep before retrying after `error`, or raise it."""
+    if not is_retryable(error):
+        # Re-raise permanent errors immediately
+        _record(attempt + 1, 'permanent_errors')
+        raise error
+    if attempt == retries - 1:  # Don't sleep on last attempt
+        _record(attempt + 1, 'failures')
+        raise Exception(f"Failed after {retries} attempts") from error
+    pause = backoff(attempt, delay, max_delay)
+    if max_wait is not None and waited + pause > max_wait:
+        _record(attempt + 1, 'failures')
+        raise Exception(f"Failed after {attempt + 1} attempts ({waited:.1f}s waited)") from error
+    if not tokens.try_spend():
+        _record(attempt + 1, 'budget_exhausted')
+        raise Exception("Retry budget exhausted") from error
+    return pause
+
+def retry_on_failure(retries=3, delay=2, max_delay=30, max_wait=None, budget=None):
+    """Retry transient sqlite errors with exponential backoff and full jitter.
+
+    `delay` is the base of the backoff, `max_wait` caps the total time
+    spent sleeping for one call, and every retry must get a token from
+    `budget` (the shared retry_budget by default). Coroutine functions
+    back off with asyncio.sleep so the event loop keeps running.
+    """
+    if retries < 1:
+        raise ValueError(f"retries must be at least 1, got {retries}")
+
     def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                tokens = retry_budget if budget is None else budget
+                waited = 0
+                for attempt in range(retries):
+                    try:
+                        result = await func(*args, **kwargs)
+                    except Exception as e:
+                        pause = _next_pause(e, attempt, waited, retries, delay, max_delay, max_wait, tokens)
+                        await asyncio.sleep(pause)
+                        waited += pause
+                    else:
+                        _record(attempt + 1)
+                        return result
+            return async_wrapper
+
         @wraps(func)
         def wrapper(*args, **kwargs):
-            last_exception = None
+            tokens = retry_budget if budget is None else budget
+            waited = 0
             for attempt in range(retries):
                 try:
-                    return func(*args, **kwargs)
-                except (sqlite3.OperationalError, sqlite3.DatabaseError) as e:
-                    last_exception = e
-                    if attempt < retries - 1:  # Don't sleep on last attempt
-                        time.sleep(delay)
-                    continue
+                    result = func(*args, **kwargs)
                 except Exception as e:
-                    # Re-raise non-retryable exceptions immediately
-                    raise e
-            raise Exception(f"Failed after {retries} attempts") from last_exception
+                    pause = _next_pause(e, attempt, waited, retries, delay, max_delay, max_wait, tokens)
+                    time.sleep(pause)
+                    waited += pause
+                else:
+                    _record(attempt + 1)
+                    return result
         return wrapper
     return decorator
 
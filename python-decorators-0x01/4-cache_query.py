@@ -1,40 +1,424 @@
 import time
-import sqlite3 
+import asyncio
+import sys
+import inspect
+import sqlite3
+import threading
 import functools
 from functools import wraps
+from collections import OrderedDict
+from query_dependencies import cache_key, tables_read, register_cache
+from sqlite_pool import aborrow, borrow, is_connection, adatabase_path, database_path
 
-# Dictionary to store cached query results
-query_cache = {}
+def estimate_size(value):
+    """Rough deep size in bytes of a query result (rows of scalars)."""
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        for key, item in value.items():
+            size += estimate_size(key) + estimate_size(item)
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        for item in value:
+            size += estimate_size(item)
+    return size
+
+class _Flight:
+    """One in-progress load of a key that other callers can wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.generation = 0
+        self.value = None
+        self.error = None
+
+class QueryCache:
+    """Thread-safe LRU cache with per-entry TTL and entry/byte limits.
+
+    A ttl of 0 keeps entries until they are evicted. Entries stored with
+    a stale_ttl may be served for that many seconds past their ttl by
+    get_or_load() while a single refresh runs.
+    """
+
+    def __init__(self, max_entries=256, max_bytes=64 * 1024 * 1024, ttl=300):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.bytes = 0
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0,
+                      'stale_hits': 0, 'coalesced': 0, 'refreshes': 0}
+        self._entries = OrderedDict()  # key -> (value, size, expires_at, tables, stale_until)
+        self._by_table = {}  # table -> keys of entries that read it
+        self._flights = {}  # key -> _Flight of the load in progress
+        self._async_flights = {}  # (loop, key) -> (future, generation) of async loads
+        self._background = set()  # async refresh tasks, referenced until they finish
+        self._generation = 0  # bumped by invalidation so in-flight loads are not stored
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        """True if `key` has a fresh entry; unlike get(), keeps its LRU position."""
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and (entry[2] is None or entry[2] > time.monotonic())
+
+    def _remove(self, key):
+        _, size, _, tables, _ = self._entries.pop(key)
+        self.bytes -= size
+        for table in tables:
+            keys = self._by_table.get(table)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_table[table]
+
+    def _lookup(self, key, count):
+        """Return ('fresh' | 'stale' | 'miss', value); call with the lock held."""
+        entry = self._entries.get(key)
+        if entry is not None and entry[2] is not None:
+            now = time.monotonic()
+            if entry[4] <= now:
+                self._remove(key)
+                self.stats['expirations'] += 1
+                entry = None
+            elif entry[2] <= now:
+                return 'stale', entry[0]
+        if entry is None:
+            if count:
+                self.stats['misses'] += 1
+            return 'miss', None
+        self._entries.move_to_end(key)
+        if count:
+            self.stats['hits'] += 1
+        return 'fresh', entry[0]
+
+    def get(self, key, count=True):
+        """Return (found, value), refreshing the entry's LRU position."""
+        with self._lock:
+            state, value = self._lookup(key, count)
+            if state == 'stale' and count:
+                self.stats['misses'] += 1
+            return state == 'fresh', value
+
+    def set(self, key, value, ttl=None, tables=(), stale_ttl=0):
+        """Store a value, evicting least recently used entries to fit.
+
+        `tables` lists the tables the result was read from, so that
+        invalidate_tables() can drop it after a write.
+        """
+        size = estimate_size(value)
+        if size > self.max_bytes:
+            return False  # would evict everything and still not fit
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl else None
+        stale_until = expires_at + stale_ttl if ttl else None
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, size, expires_at, frozenset(tables), stale_until)
+            self.bytes += size
+            for table in tables:
+                self._by_table.setdefault(table, set()).add(key)
+            while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.stats['evictions'] += 1
+        return True
+
+    def _start(self, key):
+        flight = self._flights[key] = _Flight()
+        flight.generation = self._generation
+        return flight
+
+    def _fill(self, key, flight, load, ttl, tables, stale_ttl):
+        try:
+            flight.value = load()
+            with self._lock:
+                # a write since the load began may have made the result stale
+                if flight.generation == self._generation:
+                    self.set(key, flight.value, ttl, tables, stale_ttl)
+        except BaseException as e:
+            flight.error = e
+        finally:
+            self._land(key, flight)
+
+    def _land(self, key, flight):
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+        flight.done.set()
+
+    def get_or_load(self, key, load, ttl=None, tables=(), stale_ttl=0, make_refresh=None):
+        """Return (how, value) for `key`, calling load() at most once at a time.
+
+        Concurrent misses on the same key wait for the first caller's load
+        instead of running their own ('coalesced'). A stale entry is
+        returned as is ('stale') while one refresh runs on a background
+        thread; make_refresh() builds that loader in the caller's thread,
+        outside the cache lock, and may return None or raise, in which
+        case the caller that found the entry stale reloads it inline.
+        `how` is 'hit', 'stale', 'coalesced' or 'loaded'.
+        """
+        with self._lock:
+            state, value = self._lookup(key, count=True)
+            if state == 'fresh':
+                return 'hit', value
+            flight = self._flights.get(key)
+            if state == 'stale' and flight is not None:
+                self.stats['stale_hits'] += 1
+                return 'stale', value
+            if flight is not None:
+                self.stats['coalesced'] += 1
+                leader = False
+            else:
+                flight = self._start(key)
+                leader = True
+                if state == 'stale':
+                    self.stats['refreshes'] += 1
+        if leader and state == 'stale':
+            # the refresher may query the caller's connection, so build it
+            # without holding up every other cache operation
+            try:
+                refresh = make_refresh() if make_refresh is not None else None
+            except Exception:
+                refresh = None  # reload inline instead
+            except BaseException as e:
+                flight.error = e
+                self._land(key, flight)
+                raise
+            if refresh is not None:
+                with self._lock:
+                    self.stats['stale_hits'] += 1
+                threading.Thread(target=self._fill, daemon=True,
+                                 args=(key, flight, refresh, ttl, tables, stale_ttl)).start()
+                return 'stale', value
+        if leader:
+            self._fill(key, flight, load, ttl, tables, stale_ttl)
+        else:
+            flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        return ('loaded' if leader else 'coalesced'), flight.value
+
+    async def _afill(self, key, loop, future, generation, load, ttl, tables, stale_ttl):
+        try:
+            value = await load()
+            with self._lock:
+                if generation == self._generation:
+                    self.set(key, value, ttl, tables, stale_ttl)
+            future.set_result(value)
+        except Exception as e:
+            future.set_exception(e)
+        finally:
+            # a cancelled load leaves the future pending; cancel it
+            self._abandon(key, loop, future)
+
+    def _abandon(self, key, loop, future):
+        """End an async flight; waiters of a cancelled one elect a new loader."""
+        if not future.done():
+            future.cancel()
+        if self._async_flights.get((loop, key), (None,))[0] is future:
+            del self._async_flights[(loop, key)]
+
+    async def aget_or_load(self, key, load, ttl=None, tables=(), stale_ttl=0, make_refresh=None):
+        """get_or_load() for coroutines: load and make_refresh are awaited.
+
+        Waiting callers share one asyncio future per key and event loop,
+        so a cancelled waiter does not cancel the load for the others. If
+        the caller running the load is cancelled, the waiters elect a new
+        loader among themselves, each with its own load().
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._lock:
+                state, value = self._lookup(key, count=True)
+                if state == 'fresh':
+                    return 'hit', value
+                flight = self._async_flights.get((loop, key))
+                if flight is not None:
+                    self.stats['stale_hits' if state == 'stale' else 'coalesced'] += 1
+                else:
+                    future = loop.create_future()
+                    generation = self._generation
+                    self._async_flights[(loop, key)] = (future, generation)
+                    if state == 'stale':
+                        self.stats['refreshes'] += 1
+            if flight is None:
+                break
+            if state == 'stale':
+                return 'stale', value
+            try:
+                return 'coalesced', await asyncio.shield(flight[0])
+            except asyncio.CancelledError:
+                task = asyncio.current_task()
+                if not flight[0].cancelled() or (hasattr(task, 'cancelling') and task.cancelling()):
+                    raise  # this caller was cancelled, not the loader
+
+        # nobody may be left to read the error of a failed background refresh
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        fill = functools.partial(self._afill, key, loop, future, generation)
+        if state == 'stale':
+            try:
+                refresh = await make_refresh() if make_refresh is not None else None
+            except asyncio.CancelledError:
+                self._abandon(key, loop, future)
+                raise
+            except Exception:
+                refresh = None  # reload inline instead
+            if refresh is not None:
+                with self._lock:
+                    self.stats['stale_hits'] += 1
+                task = loop.create_task(fill(refresh, ttl, tables, stale_ttl))
+                self._background.add(task)
+                task.add_done_callback(self._background.discard)
+                return 'stale', value
+        await fill(load, ttl, tables, stale_ttl)
+        return 'loaded', future.result()
+
+    def invalidate(self, key):
+        with self._lock:
+            self._generation += 1
+            if key in self._entries:
+                self._remove(key)
+
+    def invalidate_tables(self, tables):
+        with self._lock:
+            self._generation += 1
+            for table in tables:
+                for key in list(self._by_table.get(table, ())):
+                    self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self._by_table.clear()
+            self.bytes = 0
+
+# Shared cache for query results, emptied of stale tables by writes
+# made through @transactional
+query_cache = QueryCache()
+register_cache(query_cache)
+
+def with_db_connection(func=None, *, pool=None):
+    if func is None:
+        return lambda f: with_db_connection(f, pool=pool)
+
+    if inspect.iscoroutinefunction(func):
+        @wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            async with aborrow() as conn:
+                if 'conn' not in kwargs and not (len(args) > 0 and is_connection(args[0])):
+                    kwargs['conn'] = conn
+                return await func(*args, **kwargs)
+        return async_wrapper
 
-def with_db_connection(func):
     @wraps(func)
     def wrapper(*args, **kwargs):
-        conn = sqlite3.connect('users.db')
-        try:
-            if 'conn' not in kwargs and not (len(args) > 0 and isinstance(args[0], sqlite3.Connection)):
+        with borrow(pool) as conn:
+            if 'conn' not in kwargs and not (len(args) > 0 and is_connection(args[0])):
                 kwargs['conn'] = conn
             return func(*args, **kwargs)
-        finally:
-            conn.close()
     return wrapper
 
-def cache_query(func):
+def _refresher(func, args, kwargs):
+    """Build a call of func that runs on its own connection to the same database.
+
+    The caller's connection is gone by the time a background refresh
+    runs, so the refresh opens another; returns None for in-memory
+    databases, which no other connection can see.
+    """
+    conn = kwargs.get('conn')
+    if conn is None and args and isinstance(args[0], sqlite3.Connection):
+        conn = args[0]
+    path = database_path(conn) if conn is not None else ''
+    if not path:
+        return None
+
+    def refresh():
+        with borrow(database=path) as fresh:
+            if 'conn' in kwargs:
+                return func(*args, **dict(kwargs, conn=fresh))
+            return func(fresh, *args[1:], **kwargs)
+    return refresh
+
+async def _arefresher(func, args, kwargs):
+    """_refresher() for coroutine functions, on an aiosqlite connection."""
+    conn = kwargs.get('conn')
+    if conn is None and args and is_connection(args[0]):
+        conn = args[0]
+    path = await adatabase_path(conn) if conn is not None else ''
+    if not path:
+        return None
+
+    async def refresh():
+        async with aborrow(path) as fresh:
+            if 'conn' in kwargs:
+                return await func(*args, **dict(kwargs, conn=fresh))
+            return await func(fresh, *args[1:], **kwargs)
+    return refresh
+
+def _query_args(args, kwargs):
+    """Extract the query and its parameters from arguments."""
+    query = kwargs.get('query', None)
+    if query is None and len(args) > 1:  # First arg is conn
+        query = args[1]
+    params = kwargs.get('params', None)
+    if params is None and len(args) > 2:
+        params = args[2]
+    return query, params
+
+def cache_query(func=None, *, cache=None, ttl=None, stale_ttl=0):
+    """Cache results by query and params; usable as @cache_query or @cache_query(cache=..., ttl=...).
+
+    Concurrent callers missing the same query share one execution. With
+    stale_ttl, results up to that many seconds past their ttl are still
+    returned while a single background refresh runs. Coroutine functions
+    get the same behavior without blocking the event loop.
+    """
+    if func is None:
+        return lambda f: cache_query(f, cache=cache, ttl=ttl, stale_ttl=stale_ttl)
+    if cache is not None:
+        register_cache(cache)
+
+    if inspect.iscoroutinefunction(func):
+        @wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            store = query_cache if cache is None else cache
+            query, params = _query_args(args, kwargs)
+            tables = tables_read(query) if query is not None else None
+            if tables is None:
+                return await func(*args, **kwargs)
+            key = cache_key(query, params)
+
+            how, result = await store.aget_or_load(
+                key, lambda: func(*args, **kwargs), ttl, tables, stale_ttl,
+                (lambda: _arefresher(func, args, kwargs)) if stale_ttl else None)
+            if how == 'loaded':
+                print("Caching result for query:", query)
+            else:
+                print("Returning cached result for query:", query)
+            return result
+        return async_wrapper
+
     @wraps(func)
     def wrapper(*args, **kwargs):
-        # Extract the query from arguments
-        query = kwargs.get('query', None)
-        if query is None and len(args) > 1:  # First arg is conn
-            query = args[1]
-        
-        # Check if query exists in cache
-        if query in query_cache:
+        store = query_cache if cache is None else cache
+        query, params = _query_args(args, kwargs)
+        # without its tables a result could never be invalidated, so skip it
+        tables = tables_read(query) if query is not None else None
+        if tables is None:
+            return func(*args, **kwargs)
+        key = cache_key(query, params)
+
+        # Serve from the cache, or run the query once for every caller waiting on it
+        how, result = store.get_or_load(
+            key, lambda: func(*args, **kwargs), ttl, tables, stale_ttl,
+            (lambda: _refresher(func, args, kwargs)) if stale_ttl else None)
+        if how == 'loaded':
+            print("Caching result for query:", query)
+        else:
             print("Returning cached result for query:", query)
-            return query_cache[query]
-        
-        # Execute and cache if not in cache
-        result = func(*args, **kwargs)
-        query_cache[query] = result
-        print("Caching result for query:", query)
         return result
     return wrapper
 
@@ -51,4 +435,4 @@ print("First call result count:", len(users))
 
 # Second call will use the cached result
 users_again = fetch_users_with_cache(query="SELECT * FROM users")
-print("Second call result count:", len(users_again))
\ No newline at end of file
+print("Second call result count:", len(users_again))
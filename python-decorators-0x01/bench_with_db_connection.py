@@ -0,0 +1,50 @@
+#!/usr/bin/python3
+"""Compare calls/sec of @with_db_connection with and without the pool.
+
+Each call looks one user up by id in users.db, which must exist in the
+current directory. With threads > 1 the calls are split across that
+many threads sharing one pool of the same size.
+
+Usage: ./bench_with_db_connection.py [calls] [threads]
+"""
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from sqlite_pool import SQLitePool
+
+with_db_connection = __import__('1-with_db_connection').with_db_connection
+
+
+def lookup(conn, user_id):
+    cursor = conn.cursor()
+    cursor.execute('SELECT * FROM users WHERE id = ?', (user_id,))
+    return cursor.fetchone()
+
+
+def run(func, calls, threads):
+    def work(count):
+        for i in range(count):
+            func(user_id=i % 50 + 1)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as executor:
+        list(executor.map(work, [calls // threads] * threads))
+    return time.perf_counter() - start
+
+
+def main(calls=20000, threads=1):
+    pool = SQLitePool('users.db', size=threads)
+    variants = [
+        ("unpooled", with_db_connection(lookup)),
+        ("pooled", with_db_connection(lookup, pool=pool)),
+    ]
+    print(f"{calls} calls on {threads} thread(s)")
+    for label, func in variants:
+        elapsed = run(func, calls, threads)
+        print(f"{label:>9} {calls / elapsed:>10.0f} calls/s")
+    print(f"pool stats: {pool.stats}")
+    pool.close()
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:3]])
@@ -0,0 +1,144 @@
+import re
+import threading
+from contextlib import contextmanager, asynccontextmanager
+
+_NAME = r'[`"\[]?([\w.]+)[`"\]]?'
+# A FROM list runs until the next clause, join or closing parenthesis
+FROM_LIST = re.compile(
+    r'\bFROM\s+(.*?)(?=\b(?:WHERE|GROUP|ORDER|LIMIT|HAVING|WINDOW|UNION|EXCEPT|INTERSECT'
+    r'|NATURAL|INNER|CROSS|LEFT|RIGHT|FULL|JOIN|ON|USING)\b|[);]|$)',
+    re.IGNORECASE | re.DOTALL)
+JOIN_TABLE = re.compile(r'\bJOIN\s+' + _NAME, re.IGNORECASE)
+TABLE_REF = re.compile(r'\s*' + _NAME + r'(?:\s+(?:AS\s+)?\w+)?\s*$', re.IGNORECASE)
+STRING = re.compile(r"'(?:[^']|'')*'")
+WRITE_TABLES = re.compile(
+    r'\b(?:UPDATE(?:\s+OR\s+\w+)?|(?:INSERT|REPLACE)(?:\s+OR\s+\w+)?\s+INTO|DELETE\s+FROM'
+    r'|(?:DROP|ALTER)\s+TABLE(?:\s+IF\s+EXISTS)?)\s+' + _NAME,
+    re.IGNORECASE)
+
+# Caches that want to hear about writes
+_caches = []
+_lock = threading.Lock()
+
+# Quoted strings and identifiers, whose spacing is part of their value
+QUOTED = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|`[^`]*`")
+WHITESPACE = re.compile(r'\s+')
+
+def normalize_sql(query):
+    """Collapse whitespace outside quotes and drop a trailing semicolon."""
+    parts = []
+    last = 0
+    for match in QUOTED.finditer(query):
+        parts.append(WHITESPACE.sub(' ', query[last:match.start()]))
+        parts.append(match.group())
+        last = match.end()
+    parts.append(WHITESPACE.sub(' ', query[last:]))
+    return ''.join(parts).strip().rstrip(';').rstrip()
+
+# String, blob and numeric literals, in that order so digits inside strings stay put
+LITERALS = re.compile(r"[xX]?'(?:[^']|'')*'|\b\d+(?:\.\d+)?(?:[eE][-+]?\d+)?\b|\b0[xX][0-9a-fA-F]+\b")
+IN_LIST = re.compile(r'\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)', re.IGNORECASE)
+
+# Keywords spelled in upper case in fingerprints, so `select` and `SELECT` match
+KEYWORDS = frozenset("""
+    ALL AND AS ASC BETWEEN BY CASE CROSS DELETE DESC DISTINCT ELSE END ESCAPE EXCEPT
+    EXISTS FROM FULL GLOB GROUP HAVING IN INNER INSERT INTERSECT INTO IS JOIN LEFT LIKE
+    LIMIT NATURAL NOT NULL OFFSET ON OR ORDER OUTER REPLACE RIGHT SELECT SET THEN UNION
+    UPDATE USING VALUES WHEN WHERE WITH
+""".split())
+# Bare words, but not :named / @named / $named parameters or table.column parts
+WORD = re.compile(r'(?<![\w:@$.])[A-Za-z_]+\b')
+OPERATOR = re.compile(r'\s*(<>|!=|<=|>=|==|=|<|>|\|\||,)\s*')
+OPERATOR_SPELLING = {'!=': '<>', '==': '=', ',': ','}
+PAREN_SPACE = re.compile(r'(?<=\()\s+|\s+(?=\))')
+
+def _canonical(sql):
+    """Upper-case keywords and space operators the same way everywhere."""
+    sql = WORD.sub(lambda m: m.group().upper() if m.group().upper() in KEYWORDS else m.group(), sql)
+    sql = OPERATOR.sub(lambda m: ', ' if m.group(1) == ',' else
+                       f" {OPERATOR_SPELLING.get(m.group(1), m.group(1))} ", sql)
+    return PAREN_SPACE.sub('', sql)
+
+def fingerprint_sql(query):
+    """normalize_sql() with literals replaced by ? and IN lists collapsed.
+
+    Queries that differ only in their values, keyword case or spacing
+    around operators share a fingerprint, and the values (which may be
+    personal data) are left out of logs and stats.
+    """
+    sql = LITERALS.sub('?', normalize_sql(query))
+    parts = []
+    last = 0
+    for match in QUOTED.finditer(sql):  # only quoted identifiers are left
+        parts.append(_canonical(sql[last:match.start()]))
+        parts.append(match.group())
+        last = match.end()
+    parts.append(_canonical(sql[last:]))
+    return IN_LIST.sub('IN (...)', ''.join(parts).strip())
+
+def normalize_params(params):
+    """Turn query parameters into something hashable."""
+    if params is None:
+        return ()
+    if isinstance(params, dict):
+        return tuple(sorted(params.items()))
+    return tuple(params)
+
+def cache_key(query, params=None):
+    return (normalize_sql(query), normalize_params(params))
+
+def tables_read(query):
+    """Return the tables `query` reads, or None if its FROM list can't be parsed.
+
+    Handles comma-separated lists (FROM orders o, users u), joins and
+    subqueries in conditions; derived tables (FROM (SELECT ...)) and table
+    functions are not parsed. A caller that gets None cannot know which
+    writes make the result stale and must not cache it.
+    """
+    sql = STRING.sub("''", query)  # 'from x' inside a literal is not a table
+    tables = {name.lower() for name in JOIN_TABLE.findall(sql)}
+    for from_list in FROM_LIST.findall(sql):
+        for ref in from_list.split(','):
+            match = TABLE_REF.match(ref)
+            if match is None:
+                return None
+            tables.add(match.group(1).lower())
+    return tables
+
+def tables_written(query):
+    return {name.lower() for name in WRITE_TABLES.findall(query)}
+
+def register_cache(cache):
+    """Have `cache.invalidate_tables()` called whenever tables are written."""
+    with _lock:
+        if cache not in _caches:
+            _caches.append(cache)
+
+def invalidate_tables(tables):
+    """Evict every cached result that read one of `tables`."""
+    if not tables:
+        return
+    with _lock:
+        caches = list(_caches)
+    for cache in caches:
+        cache.invalidate_tables(tables)
+
+@contextmanager
+def track_writes(conn):
+    """Collect the tables written by statements run on `conn` in the block."""
+    written = set()
+    conn.set_trace_callback(lambda statement: written.update(tables_written(statement)))
+    try:
+        yield written
+    finally:
+        conn.set_trace_callback(None)
+
+@asynccontextmanager
+async def atrack_writes(conn):
+    """track_writes() for an aiosqlite connection."""
+    written = set()
+    await conn.set_trace_callback(lambda statement: written.update(tables_written(statement)))
+    try:
+        yield written
+    finally:
+        await conn.set_trace_callback(None)
@@ -0,0 +1,137 @@
+import os
+import json
+import queue
+import atexit
+import random
+import hashlib
+import functools
+import logging
+import threading
+from logging.handlers import QueueHandler, QueueListener
+from query_dependencies import fingerprint_sql
+from query_stats import query_stats
+
+# Defaults for @log_queries, overridable per decorator
+SAMPLE_RATE = float(os.environ.get('QUERY_LOG_SAMPLE_RATE', '1.0'))
+SLOW_MS = float(os.environ.get('QUERY_LOG_SLOW_MS', '100'))
+
+logger = logging.getLogger('queries')
+
+_listener = None
+_lock = threading.Lock()
+
+@functools.lru_cache(maxsize=1024)
+def describe(query):
+    """Return (fingerprint, SQL with literals stripped) for a query."""
+    sql = fingerprint_sql(query)
+    return hashlib.sha1(sql.encode()).hexdigest()[:16], sql
+
+def fingerprint(query):
+    """Short stable id for a query."""
+    return describe(query)[0]
+
+def count_params(params):
+    """Number of bound parameters, or None when `params` isn't a parameter list.
+
+    The decorator takes the second positional argument as the params,
+    which for e.g. top(query, limit) is a plain int.
+    """
+    if params is None:
+        return 0
+    if isinstance(params, (list, tuple, dict)):
+        return len(params)
+    return None
+
+def count_rows(result):
+    if isinstance(result, (list, tuple)):
+        return len(result)
+    return None if result is None else 1
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line built from the record's `query` fields."""
+
+    def format(self, record):
+        entry = {'time': round(record.created, 6), 'level': record.levelname}
+        entry.update(getattr(record, 'query', None) or {'message': record.getMessage()})
+        return json.dumps(entry, default=str)
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler that never blocks or raises: records are dropped when the queue is full."""
+
+    def __init__(self, records):
+        super().__init__(records)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # formatting happens on the listener thread, not the caller's
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+def start_logging(stream=None, maxsize=10000):
+    """Send query records through a bounded queue to a JSON writer thread.
+
+    Callers only pay for putting a record on the queue; the writer
+    thread does the formatting and I/O. Safe to call more than once.
+    """
+    global _listener
+    with _lock:
+        if _listener is None:
+            records = queue.Queue(maxsize)
+            target = logging.StreamHandler(stream)
+            target.setFormatter(JsonFormatter())
+            _listener = QueueListener(records, target)
+            logger.addHandler(DroppingQueueHandler(records))
+            logger.setLevel(logging.INFO)
+            logger.propagate = False
+            _listener.start()
+            atexit.register(stop_logging)
+        return _listener
+
+def stop_logging():
+    """Write out queued records and stop the writer thread."""
+    global _listener
+    with _lock:
+        if _listener is not None:
+            _listener.stop()
+            for handler in [h for h in logger.handlers if isinstance(h, DroppingQueueHandler)]:
+                logger.removeHandler(handler)
+            _listener = None
+
+def record_query(query, params, duration, result=None, error=None, sample_rate=None, slow_ms=None):
+    """Add one query run to query_stats and log it.
+
+    Every run is counted in the stats; slow and failed queries are
+    always logged, the rest sampled.
+    """
+    sample_rate = SAMPLE_RATE if sample_rate is None else sample_rate
+    slow_ms = SLOW_MS if slow_ms is None else slow_ms
+    duration_ms = duration * 1000
+    query_id, sql = describe(query)
+    rows = count_rows(result)
+    query_stats.record(query_id, sql, duration_ms, rows, error is not None)
+    if error is not None:
+        level = logging.ERROR
+    elif slow_ms is not None and duration_ms >= slow_ms:
+        level = logging.WARNING
+    elif sample_rate >= 1 or random.random() < sample_rate:
+        level = logging.INFO
+    else:
+        return
+    if not logger.isEnabledFor(level):
+        return
+    entry = {
+        'fingerprint': query_id,
+        'sql': sql,
+        'params': count_params(params),
+        'duration_ms': round(duration_ms, 3),
+        'rows': rows,
+        'slow': level == logging.WARNING,
+    }
+    if error is not None:
+        entry['error'] = type(error).__name__
+    logger.log(level, 'query', extra={'query': entry})
@@ -0,0 +1,98 @@
+import math
+import random
+import threading
+
+# Latency samples kept per fingerprint for the percentiles
+RESERVOIR_SIZE = 1024
+
+class FingerprintStats:
+    """Running totals for one fingerprint plus a reservoir of latencies."""
+
+    def __init__(self, sql):
+        self.sql = sql
+        self.count = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.rows = 0
+        self.samples = []
+
+    def add(self, duration_ms, rows, error):
+        self.count += 1
+        self.total_ms += duration_ms
+        self.max_ms = max(self.max_ms, duration_ms)
+        self.rows += rows or 0
+        if error:
+            self.errors += 1
+        # reservoir sampling keeps a uniform sample of every call so far
+        if len(self.samples) < RESERVOIR_SIZE:
+            self.samples.append(duration_ms)
+        else:
+            slot = random.randrange(self.count)
+            if slot < RESERVOIR_SIZE:
+                self.samples[slot] = duration_ms
+
+    def percentile(self, q):
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[max(1, math.ceil(q / 100 * len(ordered))) - 1]
+
+    def summary(self):
+        return {
+            'sql': self.sql,
+            'count': self.count,
+            'errors': self.errors,
+            'total_ms': round(self.total_ms, 3),
+            'avg_ms': round(self.total_ms / self.count, 3) if self.count else 0.0,
+            'p95_ms': round(self.percentile(95), 3),
+            'p99_ms': round(self.percentile(99), 3),
+            'max_ms': round(self.max_ms, 3),
+            'rows': self.rows,
+            'avg_rows': round(self.rows / self.count, 1) if self.count else 0.0,
+        }
+
+class QueryStats:
+    """Per-fingerprint query statistics, filled in by @log_queries."""
+
+    def __init__(self):
+        self._stats = {}  # fingerprint -> FingerprintStats
+        self._lock = threading.Lock()
+
+    def record(self, fingerprint, sql, duration_ms, rows=None, error=False):
+        with self._lock:
+            stats = self._stats.get(fingerprint)
+            if stats is None:
+                stats = self._stats[fingerprint] = FingerprintStats(sql)
+            stats.add(duration_ms, rows, error)
+
+    def dump(self, sort='total_ms'):
+        """Return one summary dict per fingerprint, heaviest first."""
+        with self._lock:
+            summaries = [dict(stats.summary(), fingerprint=fingerprint)
+                         for fingerprint, stats in self._stats.items()]
+        return sorted(summaries, key=lambda summary: summary[sort], reverse=True)
+
+    def report(self, limit=10, sort='total_ms'):
+        """Format the top `limit` fingerprints as a text table."""
+        lines = [f"{'count':>8} {'total ms':>10} {'avg ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'rows':>8}  query"]
+        for summary in self.dump(sort)[:limit]:
+            lines.append(f"{summary['count']:>8} {summary['total_ms']:>10.1f} {summary['avg_ms']:>8.2f} "
+                         f"{summary['p95_ms']:>8.2f} {summary['p99_ms']:>8.2f} {summary['rows']:>8}  {summary['sql']}")
+        return '\n'.join(lines)
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+# Shared registry for the process
+query_stats = QueryStats()
+
+def dump_stats(sort='total_ms'):
+    return query_stats.dump(sort)
+
+def report(limit=10, sort='total_ms'):
+    return query_stats.report(limit, sort)
+
+def reset_stats():
+    query_stats.reset()
@@ -0,0 +1,151 @@
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager, asynccontextmanager
+
+try:
+    import aiosqlite
+except ImportError:
+    aiosqlite = None
+
+# Applied once to every new pooled connection
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    'busy_timeout': 5000,
+}
+
+class PoolTimeout(sqlite3.OperationalError):
+    """No pooled connection became free in time."""
+
+class SQLitePool:
+    """A small pool of sqlite3 connections with per-thread affinity.
+
+    A thread gets back the connection it used last whenever that one is
+    idle, so its page cache and prepared statements stay warm; otherwise
+    it takes any idle connection, or opens a new one while fewer than
+    `size` exist.
+    """
+
+    def __init__(self, database='users.db', size=5, pragmas=None, timeout=30):
+        self.database = database
+        self.size = size
+        self.pragmas = DEFAULT_PRAGMAS if pragmas is None else pragmas
+        self.timeout = timeout
+        self.stats = {'connects': 0, 'borrows': 0, 'affinity_hits': 0}
+        self._idle = {}  # connection -> thread id that last released it
+        self._open = 0
+        self._cond = threading.Condition()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.database, check_same_thread=False)
+        for name, value in self.pragmas.items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def acquire(self):
+        me = threading.get_ident()
+        deadline = time.monotonic() + self.timeout
+        with self._cond:
+            while True:
+                if self._idle:
+                    mine = [c for c, owner in self._idle.items() if owner == me]
+                    conn = mine[-1] if mine else next(reversed(self._idle))
+                    del self._idle[conn]
+                    self.stats['borrows'] += 1
+                    if mine:
+                        self.stats['affinity_hits'] += 1
+                    return conn
+                if self._open < self.size:
+                    self._open += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise PoolTimeout(f'No connection to {self.database} free after {self.timeout}s')
+                self._cond.wait(remaining)
+        try:
+            conn = self._connect()
+        except Exception:
+            with self._cond:
+                self._open -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self.stats['connects'] += 1
+            self.stats['borrows'] += 1
+        return conn
+
+    def release(self, conn):
+        if conn.in_transaction:
+            conn.rollback()  # never hand an open transaction to the next caller
+        with self._cond:
+            self._idle[conn] = threading.get_ident()
+            self._cond.notify()
+
+    def close(self):
+        with self._cond:
+            idle, self._idle = list(self._idle), {}
+            self._open -= len(idle)
+        for conn in idle:
+            conn.close()
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+def get_pool(database='users.db'):
+    """Return the shared pool for `database`, sized by SQLITE_POOL_SIZE."""
+    with _pools_lock:
+        if database not in _pools:
+            _pools[database] = SQLitePool(database, size=int(os.environ.get('SQLITE_POOL_SIZE', '5')))
+        return _pools[database]
+
+@contextmanager
+def borrow(pool=None, database='users.db'):
+    """Yield a connection from `pool` (True for the shared one) and give it back.
+
+    Without a pool this opens a plain connection and closes it afterwards.
+    """
+    if pool is None or pool is False:
+        conn = sqlite3.connect(database)
+        try:
+            yield conn
+        finally:
+            conn.close()
+        return
+    if pool is True:
+        pool = get_pool(database)
+    conn = pool.acquire()
+    try:
+        yield conn
+    finally:
+        pool.release(conn)
+
+def database_path(conn):
+    """Return the file `conn` has open, or '' for an in-memory database."""
+    for _, name, path in conn.execute('PRAGMA database_list'):
+        if name == 'main':
+            return path
+    return ''
+
+def is_connection(obj):
+    """True for a sqlite3 or an aiosqlite connection."""
+    return isinstance(obj, sqlite3.Connection) or (
+        aiosqlite is not None and isinstance(obj, aiosqlite.Connection))
+
+@asynccontextmanager
+async def aborrow(database='users.db'):
+    """Yield an aiosqlite connection to `database`, closed afterwards."""
+    if aiosqlite is None:
+        raise RuntimeError('aiosqlite is required to decorate async functions')
+    async with aiosqlite.connect(database) as conn:
+        yield conn
+
+async def adatabase_path(conn):
+    """database_path() for an aiosqlite connection."""
+    async with conn.execute('PRAGMA database_list') as cursor:
+        for _, name, path in await cursor.fetchall():
+            if name == 'main':
+                return path
+    return ''
@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+"""Tests for single-flight loading and stale refreshes in 4-cache_query."""
+import asyncio
+import contextlib
+import io
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+cache_query_module = None
+
+
+def setUpModule():
+    """Import 4-cache_query, whose demo reads users.db from the cwd"""
+    global cache_query_module
+    directory = tempfile.mkdtemp()
+    unittest.addModuleCleanup(shutil.rmtree, directory)
+    with sqlite3.connect(os.path.join(directory, "users.db")) as conn:
+        conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT, "
+                     "email TEXT, age INTEGER)")
+        conn.executemany("INSERT INTO users (name, email, age) VALUES (?, ?, ?)",
+                         [(f"user {i}", f"user{i}@example.com", 20 + i) for i in range(10)])
+    cwd = os.getcwd()
+    os.chdir(directory)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            cache_query_module = __import__('4-cache_query')
+    finally:
+        os.chdir(cwd)
+    unittest.addModuleCleanup(os.chdir, cwd)
+
+
+class TestQueryCache(unittest.TestCase):
+    def setUp(self):
+        self.now = [1000.0]
+        patcher = patch.object(cache_query_module.time, "monotonic", lambda: self.now[0])
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_evicts_least_recently_used_entry(self):
+        """Past max_entries the entry read longest ago goes first"""
+        cache = cache_query_module.QueryCache(max_entries=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        self.assertEqual(list(cache._entries), ["a", "c"])
+        self.assertEqual(cache.stats["evictions"], 1)
+
+    def test_membership_does_not_reorder(self):
+        """`key in cache` leaves the LRU order alone"""
+        cache = cache_query_module.QueryCache(max_entries=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        self.assertIn("a", cache)
+        cache.set("c", 3)
+        self.assertNotIn("a", cache)
+        self.assertEqual(list(cache._entries), ["b", "c"])
+        self.assertEqual(cache.stats["hits"], 0)
+
+    def test_evicts_to_fit_max_bytes(self):
+        """Entries are evicted until the byte total fits; oversize values are refused"""
+        rows = [("x" * 100,)]
+        size = cache_query_module.estimate_size(rows)
+        cache = cache_query_module.QueryCache(max_bytes=size * 2)
+        for key in ("a", "b", "c"):
+            self.assertTrue(cache.set(key, rows))
+        self.assertEqual(list(cache._entries), ["b", "c"])
+        self.assertEqual(cache.bytes, size * 2)
+        self.assertEqual(cache.stats["evictions"], 1)
+        self.assertFalse(cache.set("big", rows * 10))
+        self.assertNotIn("big", cache)
+
+    def test_entries_expire_after_ttl(self):
+        """An expired entry is a miss, counted and freed; ttl=0 never expires"""
+        cache = cache_query_module.QueryCache(ttl=10)
+        cache.set("a", [1])
+        cache.set("forever", [2], ttl=0)
+        self.now[0] += 9
+        self.assertEqual(cache.get("a"), (True, [1]))
+        self.now[0] += 2
+        self.assertNotIn("a", cache)
+        self.assertEqual(cache.get("a"), (False, None))
+        self.assertEqual(cache.stats["expirations"], 1)
+        self.assertEqual(cache.stats["misses"], 1)
+        self.assertEqual(len(cache), 1)
+        self.assertEqual(cache.bytes, cache_query_module.estimate_size([2]))
+        self.now[0] += 10 ** 6
+        self.assertEqual(cache.get("forever"), (True, [2]))
+
+
+class TestGetOrLoad(unittest.TestCase):
+    def setUp(self):
+        self.cache = cache_query_module.QueryCache(ttl=0)
+
+    def run_threads(self, target, count=8):
+        threads = [threading.Thread(target=target) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def test_concurrent_misses_load_once(self):
+        """Threads missing the same key share the first caller's load"""
+        loads = []
+        results = []
+
+        def load():
+            loads.append(1)
+            time.sleep(0.1)
+            return ["row"]
+
+        self.run_threads(lambda: results.append(self.cache.get_or_load("key", load)))
+        self.assertEqual(len(loads), 1)
+        self.assertEqual([value for _, value in results], [["row"]] * 8)
+        self.assertEqual(sorted(how for how, _ in results),
+                         ["coalesced"] * 7 + ["loaded"])
+        self.assertEqual(self.cache.stats["coalesced"], 7)
+
+    def test_waiters_get_the_loader_error(self):
+        """A failed load raises in every waiting caller and is not cached"""
+        errors = []
+
+        def load():
+            time.sleep(0.1)
+            raise sqlite3.OperationalError("database is locked")
+
+        def call():
+            try:
+                self.cache.get_or_load("key", load)
+            except sqlite3.OperationalError as err:
+                errors.append(err)
+
+        self.run_threads(call, count=4)
+        self.assertEqual(len(errors), 4)
+        self.assertNotIn("key", self.cache)
+
+    def test_invalidation_during_load_is_not_stored(self):
+        """A write while a load runs keeps its result out of the cache"""
+        started = threading.Event()
+
+        def load():
+            started.set()
+            time.sleep(0.1)
+            return ["old row"]
+
+        thread = threading.Thread(
+            target=lambda: self.cache.get_or_load("key", load, tables={"users"}))
+        thread.start()
+        started.wait()
+        self.cache.invalidate_tables({"users"})
+        thread.join()
+        self.assertNotIn("key", self.cache)
+
+    def test_stale_entry_served_while_one_refresh_runs(self):
+        """Expired entries within stale_ttl return at once; one refresh runs"""
+        refreshes = []
+        release = threading.Event()
+
+        def refresh():
+            refreshes.append(1)
+            release.wait()
+            return "new"
+
+        self.cache.set("key", "old", ttl=0.05, stale_ttl=5)
+        time.sleep(0.1)
+        for _ in range(3):
+            how, value = self.cache.get_or_load("key", lambda: "inline", ttl=0.05,
+                                                stale_ttl=5, make_refresh=lambda: refresh)
+            self.assertEqual((how, value), ("stale", "old"))
+        release.set()
+        for _ in range(50):
+            if self.cache.get("key", count=False)[0]:
+                break
+            time.sleep(0.01)
+        self.assertEqual(self.cache.get("key"), (True, "new"))
+        self.assertEqual(len(refreshes), 1)
+        self.assertEqual(self.cache.stats["refreshes"], 1)
+
+    def test_building_the_refresher_does_not_block_the_cache(self):
+        """Other keys stay usable while make_refresh() runs"""
+        building = threading.Event()
+        release = threading.Event()
+        self.addCleanup(release.set)
+
+        def make_refresh():
+            building.set()
+            release.wait(5)
+            return lambda: "new"
+
+        self.cache.set("key", "old", ttl=0.05, stale_ttl=5)
+        time.sleep(0.1)
+        results = []
+        thread = threading.Thread(target=lambda: results.append(self.cache.get_or_load(
+            "key", lambda: "inline", ttl=0.05, stale_ttl=5, make_refresh=make_refresh)))
+        thread.start()
+        building.wait()
+        done = threading.Event()
+        threading.Thread(target=lambda: (self.cache.set("other", 1), done.set())).start()
+        self.assertTrue(done.wait(1))
+        self.assertEqual(self.cache.get_or_load("key", lambda: "inline"), ("stale", "old"))
+        release.set()
+        thread.join()
+        self.assertEqual(results, [("stale", "old")])
+
+    def test_failing_refresher_reloads_inline(self):
+        """If make_refresh() raises, the caller reloads the entry itself"""
+        def make_refresh():
+            raise sqlite3.OperationalError("unable to open database file")
+
+        self.cache.set("key", "old", ttl=0.05, stale_ttl=5)
+        time.sleep(0.1)
+        self.assertEqual(self.cache.get_or_load("key", lambda: "new", ttl=0.05, stale_ttl=5,
+                                                make_refresh=make_refresh), ("loaded", "new"))
+        self.assertEqual(self.cache.get("key"), (True, "new"))
+
+
+class TestCacheQueryDecorator(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, "users.db")
+        with sqlite3.connect(self.path) as conn:
+            conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT)")
+            conn.execute("INSERT INTO users (name) VALUES ('first')")
+        self.cache = cache_query_module.QueryCache()
+        self.calls = []
+
+    def query(self, conn):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return self.fetch(conn, "SELECT name FROM users")
+
+    def test_stale_refresh_uses_its_own_connection(self):
+        """The background refresh reads fresh rows after the caller is done"""
+        @cache_query_module.cache_query(cache=self.cache, ttl=0.05, stale_ttl=5)
+        def fetch(conn, query):
+            self.calls.append(threading.current_thread().name)
+            return conn.execute(query).fetchall()
+        self.fetch = fetch
+
+        conn = sqlite3.connect(self.path)
+        self.assertEqual(self.query(conn), [("first",)])
+        conn.execute("UPDATE users SET name = 'second'")
+        conn.commit()
+        conn.close()
+
+        time.sleep(0.1)
+        conn = sqlite3.connect(self.path)
+        self.addCleanup(conn.close)
+        self.assertEqual(self.query(conn), [("first",)])  # stale, refreshing
+        for _ in range(50):
+            if len(self.calls) == 2 and self.cache.get(
+                    cache_query_module.cache_key("SELECT name FROM users"), count=False)[0]:
+                break
+            time.sleep(0.01)
+        self.assertEqual(self.query(conn), [("second",)])
+        self.assertEqual(len(self.calls), 2)
+        self.assertNotEqual(self.calls[1], threading.current_thread().name)
+
+
+class TestAsyncGetOrLoad(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.cache = cache_query_module.QueryCache(ttl=0)
+
+    async def test_concurrent_misses_load_once(self):
+        """Coroutines missing the same key await one load"""
+        loads = []
+
+        async def load():
+            loads.append(1)
+            await asyncio.sleep(0.05)
+            return ["row"]
+
+        results = await asyncio.gather(
+            *[self.cache.aget_or_load("key", load) for _ in range(8)])
+        self.assertEqual(len(loads), 1)
+        self.assertEqual(sorted(how for how, _ in results),
+                         ["coalesced"] * 7 + ["loaded"])
+
+    async def test_cancelled_loader_does_not_cancel_waiters(self):
+        """When the loading caller is cancelled a waiter loads instead"""
+        loads = []
+
+        async def load():
+            loads.append(1)
+            await asyncio.sleep(0.05)
+            return ["row"]
+
+        leader = asyncio.create_task(self.cache.aget_or_load("key", load))
+        await asyncio.sleep(0)
+        waiters = [asyncio.create_task(self.cache.aget_or_load("key", load))
+                   for _ in range(3)]
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        results = await asyncio.gather(*waiters)
+        self.assertEqual([value for _, value in results], [["row"]] * 3)
+        self.assertEqual(sorted(how for how, _ in results),
+                         ["coalesced", "coalesced", "loaded"])
+        self.assertEqual(len(loads), 2)
+        with self.assertRaises(asyncio.CancelledError):
+            await leader
+
+    async def test_cancelled_waiter_does_not_cancel_load(self):
+        """A waiter that gives up leaves the load running for the others"""
+        async def load():
+            await asyncio.sleep(0.05)
+            return ["row"]
+
+        leader = asyncio.create_task(self.cache.aget_or_load("key", load))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(self.cache.aget_or_load("key", load))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        self.assertEqual(await leader, ("loaded", ["row"]))
+        with self.assertRaises(asyncio.CancelledError):
+            await waiter
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""Tests for the cache keys and table tracking in query_dependencies."""
+import unittest
+from query_dependencies import cache_key, fingerprint_sql, normalize_sql, tables_read
+
+
+class TestNormalizeSql(unittest.TestCase):
+    def test_collapses_whitespace_between_tokens(self):
+        """Spacing and a trailing semicolon do not change the key"""
+        self.assertEqual(normalize_sql("  SELECT *\n\tFROM users ;"),
+                         "SELECT * FROM users")
+        self.assertEqual(cache_key("SELECT  *  FROM users"),
+                         cache_key("SELECT * FROM users;"))
+
+    def test_keeps_whitespace_inside_literals(self):
+        """Literals that differ only in spacing get different keys"""
+        self.assertNotEqual(
+            cache_key("SELECT * FROM users WHERE name = 'a b'"),
+            cache_key("SELECT * FROM users WHERE name = 'a  b'"),
+        )
+        self.assertEqual(
+            normalize_sql("SELECT \"my  col\" FROM users WHERE name = 'it''s  x'"),
+            "SELECT \"my  col\" FROM users WHERE name = 'it''s  x'",
+        )
+
+
+class TestFingerprintSql(unittest.TestCase):
+    def test_literals_are_stripped(self):
+        """String, number and blob values become ?"""
+        self.assertEqual(
+            fingerprint_sql("SELECT * FROM users WHERE name = 'it''s 42' AND age > 30.5 "
+                            "AND avatar = x'ff00' AND id = 0x1F"),
+            "SELECT * FROM users WHERE name = ? AND age > ? AND avatar = ? AND id = ?",
+        )
+
+    def test_in_lists_collapse(self):
+        """IN lists of any length share one fingerprint"""
+        self.assertEqual(fingerprint_sql("SELECT * FROM users WHERE id IN (1, 2, 3)"),
+                         fingerprint_sql("SELECT * FROM users WHERE id in(?,?)"))
+        self.assertEqual(fingerprint_sql("SELECT * FROM users WHERE id IN (7)"),
+                         "SELECT * FROM users WHERE id IN (...)")
+
+    def test_keyword_case_and_operator_spacing(self):
+        """Keyword case and spacing around operators do not split fingerprints"""
+        self.assertEqual(fingerprint_sql("select name,email from users where id=5 and age>=3;"),
+                         "SELECT name, email FROM users WHERE id = ? AND age >= ?")
+        self.assertEqual(fingerprint_sql("SELECT * FROM users WHERE id != 1"),
+                         fingerprint_sql("SELECT * FROM users WHERE id<>2"))
+
+    def test_identifiers_and_named_params_keep_their_case(self):
+        """Quoted identifiers, table.column parts and :named params are left alone"""
+        self.assertEqual(
+            fingerprint_sql('select "from  x" from users u where u.order=:limit'),
+            'SELECT "from  x" FROM users u WHERE u.order = :limit',
+        )
+
+
+class TestTablesRead(unittest.TestCase):
+    def test_comma_separated_from_list(self):
+        """Every table of an implicit join is tracked"""
+        self.assertEqual(
+            tables_read("SELECT * FROM orders o, users AS u WHERE o.uid = u.id"),
+            {"orders", "users"},
+        )
+
+    def test_joins_and_condition_subqueries(self):
+        """Joined tables and tables of IN (SELECT ...) are tracked"""
+        self.assertEqual(
+            tables_read("SELECT * FROM users u LEFT JOIN orders o ON o.uid = u.id "
+                        "WHERE u.id IN (SELECT uid FROM payments)"),
+            {"users", "orders", "payments"},
+        )
+
+    def test_literals_are_not_tables(self):
+        """'from x' inside a string is not read as a table"""
+        self.assertEqual(
+            tables_read("SELECT * FROM users WHERE name = 'from x'"),
+            {"users"},
+        )
+
+    def test_unparseable_from_list(self):
+        """Derived tables and table functions give None"""
+        self.assertIsNone(tables_read("SELECT * FROM (SELECT id FROM users) t, orders"))
+        self.assertIsNone(tables_read("SELECT * FROM json_each(?)"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""Tests for the query records written by query_log."""
+import io
+import json
+import unittest
+from unittest.mock import patch
+import query_log
+
+
+class TestRecordQuery(unittest.TestCase):
+    def setUp(self):
+        self.stream = io.StringIO()
+        query_log.start_logging(self.stream)
+        self.addCleanup(query_log.stop_logging)
+
+    def records(self):
+        query_log.stop_logging()
+        return [json.loads(line) for line in self.stream.getvalue().splitlines()]
+
+    def test_params_counted_for_sequences_and_dicts(self):
+        """Lists, tuples and dicts of parameters report their length"""
+        query_log.record_query("SELECT ?, ?", (1, 2), 0.001, [], sample_rate=1)
+        query_log.record_query("SELECT :a", {"a": 1}, 0.001, [], sample_rate=1)
+        query_log.record_query("SELECT 1", None, 0.001, [], sample_rate=1)
+        self.assertEqual([record["params"] for record in self.records()], [2, 1, 0])
+
+    def test_unsized_second_argument_does_not_raise(self):
+        """A scalar second argument, e.g. top(query, limit), is not a params list"""
+        for sample_rate in (1, 0):
+            query_log.record_query("SELECT * FROM users LIMIT ?", 10, 0.5, [1],
+                                   sample_rate=sample_rate, slow_ms=100)
+        self.assertEqual([record["params"] for record in self.records()], [None, None])
+
+    def test_sampling_and_slow_threshold(self):
+        """Sampled-out fast queries are dropped; slow ones are always logged"""
+        with patch.object(query_log.random, "random", return_value=0.9):
+            query_log.record_query("SELECT 1", (), 0.001, [], sample_rate=0.5, slow_ms=100)
+            query_log.record_query("SELECT 2", (), 0.2, [], sample_rate=0.5, slow_ms=100)
+        records = self.records()
+        self.assertEqual([record["sql"] for record in records], ["SELECT ?"])
+        self.assertTrue(records[0]["slow"])
+        self.assertEqual(records[0]["level"], "WARNING")
+
+
+if __name__ == "__main__":
+    unittest.main()
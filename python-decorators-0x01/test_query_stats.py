@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""Tests for the per-fingerprint registry in query_stats."""
+import unittest
+from unittest.mock import patch
+import query_stats
+from query_stats import FingerprintStats, QueryStats
+
+
+class TestFingerprintStats(unittest.TestCase):
+    def test_percentiles(self):
+        """p95 and p99 are nearest-rank over the latency samples"""
+        stats = FingerprintStats("SELECT ?")
+        for duration_ms in range(100, 0, -1):
+            stats.add(duration_ms, rows=1, error=False)
+        summary = stats.summary()
+        self.assertEqual((summary['p95_ms'], summary['p99_ms']), (95, 99))
+        self.assertEqual((summary['count'], summary['avg_ms'], summary['max_ms']), (100, 50.5, 100))
+        self.assertEqual(FingerprintStats("SELECT ?").percentile(95), 0.0)
+
+    def test_reservoir_is_bounded(self):
+        """Past RESERVOIR_SIZE calls samples are replaced, not appended"""
+        with patch.object(query_stats, "RESERVOIR_SIZE", 10):
+            stats = FingerprintStats("SELECT ?")
+            for duration_ms in range(1000):
+                stats.add(duration_ms, rows=None, error=duration_ms % 100 == 0)
+        self.assertEqual(len(stats.samples), 10)
+        self.assertEqual(stats.count, 1000)
+        self.assertEqual(stats.errors, 10)
+        self.assertEqual(stats.max_ms, 999)
+        self.assertTrue(all(0 <= sample < 1000 for sample in stats.samples))
+
+
+class TestQueryStats(unittest.TestCase):
+    def setUp(self):
+        self.stats = QueryStats()
+        for _ in range(10):
+            self.stats.record("a", "SELECT * FROM users WHERE id = ?", 1.0, rows=1)
+        self.stats.record("b", "SELECT * FROM users", 50.0, rows=500)
+        self.stats.record("b", "SELECT * FROM users", 30.0, rows=500, error=True)
+
+    def test_dump_sorts_heaviest_first(self):
+        """dump() orders fingerprints by the chosen column, largest first"""
+        self.assertEqual([summary['fingerprint'] for summary in self.stats.dump()], ["b", "a"])
+        self.assertEqual([summary['fingerprint'] for summary in self.stats.dump(sort='count')],
+                         ["a", "b"])
+        heavy = self.stats.dump()[0]
+        self.assertEqual((heavy['count'], heavy['errors'], heavy['total_ms'], heavy['rows']),
+                         (2, 1, 80.0, 1000))
+
+    def test_report_limits_rows(self):
+        """report() prints a header plus at most `limit` fingerprints"""
+        lines = self.stats.report(limit=1).splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[1].endswith("SELECT * FROM users"))
+
+    def test_reset(self):
+        """reset() forgets every fingerprint"""
+        self.stats.reset()
+        self.assertEqual(self.stats.dump(), [])
+        self.stats.record("a", "SELECT ?", 2.0)
+        self.assertEqual(self.stats.dump()[0]['count'], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
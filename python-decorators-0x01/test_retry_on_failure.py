@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""Tests for the backoff, budget and stats of 3-retry_on_failure."""
+import contextlib
+import io
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+from collections import Counter
+from unittest.mock import patch
+
+retry_module = None
+
+
+def setUpModule():
+    """Import 3-retry_on_failure, whose demo reads users.db from the cwd"""
+    global retry_module
+    directory = tempfile.mkdtemp()
+    unittest.addModuleCleanup(shutil.rmtree, directory)
+    with sqlite3.connect(os.path.join(directory, "users.db")) as conn:
+        conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT)")
+    cwd = os.getcwd()
+    os.chdir(directory)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            retry_module = __import__('3-retry_on_failure')
+    finally:
+        os.chdir(cwd)
+
+
+def locked(times, result="ok", error="database is locked"):
+    """A function that raises OperationalError(error) `times` times, then returns."""
+    calls = []
+
+    def func():
+        calls.append(1)
+        if len(calls) <= times:
+            raise sqlite3.OperationalError(error)
+        return result
+    return func, calls
+
+
+class TestBackoff(unittest.TestCase):
+    def test_sleep_is_bounded_by_delay_and_cap(self):
+        """Full jitter stays within [0, min(max_delay, delay * 2**attempt)]"""
+        with patch.object(retry_module.random, "uniform", lambda low, high: high):
+            self.assertEqual([retry_module.backoff(attempt, 1, 30) for attempt in range(7)],
+                             [1, 2, 4, 8, 16, 30, 30])
+        for attempt in range(10):
+            self.assertTrue(0 <= retry_module.backoff(attempt, 0.5, 3) <= 3)
+
+
+class TestRetryBudget(unittest.TestCase):
+    def test_tokens_run_out_and_refill(self):
+        """Each retry takes a token; tokens come back at `rate` per second"""
+        now = [100.0]
+        with patch.object(retry_module.time, "monotonic", lambda: now[0]):
+            budget = retry_module.RetryBudget(rate=2, capacity=2)
+            self.assertEqual([budget.try_spend() for _ in range(3)], [True, True, False])
+            now[0] += 0.5
+            self.assertEqual([budget.try_spend() for _ in range(2)], [True, False])
+            now[0] += 60
+            self.assertEqual(budget.tokens, 0)
+            budget.try_spend()
+            self.assertEqual(budget.tokens, 1)  # refilled to capacity, one spent
+
+
+class TestRetryOnFailure(unittest.TestCase):
+    def setUp(self):
+        self.sleeps = []
+        patcher = patch.object(retry_module.time, "sleep", self.sleeps.append)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.budget = retry_module.RetryBudget(rate=0, capacity=100)
+
+    def retry(self, **kwargs):
+        kwargs.setdefault("budget", self.budget)
+        return retry_module.retry_on_failure(**kwargs)
+
+    def test_retries_must_be_positive(self):
+        """retries=0 would never call the function, so it is refused"""
+        with self.assertRaises(ValueError):
+            self.retry(retries=0)
+
+    def test_lock_errors_are_retried(self):
+        """'database is locked' is retried until the call succeeds"""
+        func, calls = locked(2)
+        self.assertEqual(self.retry(retries=3, delay=0.01)(func)(), "ok")
+        self.assertEqual(len(calls), 3)
+        self.assertEqual(len(self.sleeps), 2)
+
+    def test_permanent_errors_are_not_retried(self):
+        """Errors that will not clear up are raised on the first attempt"""
+        for error in (sqlite3.OperationalError("no such table: users"),
+                      sqlite3.IntegrityError("UNIQUE constraint failed")):
+            calls = []
+
+            def func():
+                calls.append(1)
+                raise error
+
+            with self.assertRaises(type(error)):
+                self.retry(retries=5)(func)()
+            self.assertEqual(len(calls), 1)
+        self.assertEqual(self.sleeps, [])
+
+    def test_gives_up_after_retries(self):
+        """The last lock error is chained to the final failure"""
+        func, calls = locked(10)
+        with self.assertRaises(Exception) as caught:
+            self.retry(retries=3, delay=0.01)(func)()
+        self.assertIn("3 attempts", str(caught.exception))
+        self.assertIsInstance(caught.exception.__cause__, sqlite3.OperationalError)
+        self.assertEqual((len(calls), len(self.sleeps)), (3, 2))
+
+    def test_max_wait_caps_total_sleep(self):
+        """A retry whose pause would pass max_wait is not attempted"""
+        func, calls = locked(10)
+        with patch.object(retry_module.random, "uniform", lambda low, high: high):
+            with self.assertRaises(Exception) as caught:
+                self.retry(retries=10, delay=1, max_wait=3.5)(func)()
+        self.assertEqual(self.sleeps, [1, 2])
+        self.assertEqual(len(calls), 3)
+        self.assertIn("3 attempts", str(caught.exception))
+
+    def test_empty_budget_stops_retries(self):
+        """Once the shared budget is spent calls fail instead of retrying"""
+        budget = retry_module.RetryBudget(rate=0, capacity=1)
+        func, calls = locked(10)
+        with self.assertRaises(Exception) as caught:
+            self.retry(retries=10, delay=0.01, budget=budget)(func)()
+        self.assertIn("budget exhausted", str(caught.exception))
+        self.assertEqual(len(calls), 2)
+
+    def test_stats(self):
+        """retry_stats counts calls, retries and how each call ended"""
+        stats = retry_module.retry_stats
+        before = {key: value.copy() if isinstance(value, Counter) else value
+                  for key, value in stats.items()}
+        self.retry(retries=3, delay=0.01)(locked(1)[0])()
+        with self.assertRaises(Exception):
+            self.retry(retries=2, delay=0.01)(locked(5)[0])()
+        with self.assertRaises(sqlite3.OperationalError):
+            self.retry(retries=3)(locked(1, error="no such table: users")[0])()
+        self.assertEqual(stats['calls'] - before['calls'], 3)
+        self.assertEqual(stats['retries'] - before['retries'], 2)
+        self.assertEqual(stats['failures'] - before['failures'], 1)
+        self.assertEqual(stats['permanent_errors'] - before['permanent_errors'], 1)
+        self.assertEqual(stats['attempts_per_call'] - before['attempts_per_call'],
+                         Counter({2: 2, 1: 1}))
+
+
+class TestAsyncRetry(unittest.IsolatedAsyncioTestCase):
+    async def test_coroutines_back_off_with_asyncio_sleep(self):
+        """Async functions are retried without blocking the loop"""
+        sleeps = []
+
+        async def sleep(seconds):
+            sleeps.append(seconds)
+
+        func, calls = locked(2)
+
+        @retry_module.retry_on_failure(retries=3, delay=0.01,
+                                       budget=retry_module.RetryBudget())
+        async def fetch():
+            return func()
+
+        with patch.object(retry_module.asyncio, "sleep", sleep):
+            self.assertEqual(await fetch(), "ok")
+        self.assertEqual((len(calls), len(sleeps)), (3, 2))
+
+
+if __name__ == "__main__":
+    unittest.main()
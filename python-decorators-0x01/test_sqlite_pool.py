@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""Tests for SQLitePool and borrow()."""
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from sqlite_pool import PoolTimeout, SQLitePool, borrow
+
+
+class TestSQLitePool(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, "users.db")
+        self.pool = SQLitePool(self.path, size=2, timeout=0.2)
+        self.addCleanup(self.pool.close)
+
+    def test_pragmas_applied_once_per_connection(self):
+        """New connections run in WAL mode with mmap enabled"""
+        with borrow(self.pool) as conn:
+            self.assertEqual(conn.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+            self.assertGreater(conn.execute("PRAGMA mmap_size").fetchone()[0], 0)
+        for _ in range(5):
+            with borrow(self.pool):
+                pass
+        self.assertEqual(self.pool.stats["connects"], 1)
+
+    def test_thread_gets_its_own_connection_back(self):
+        """A thread reuses the connection it released last"""
+        first = self.pool.acquire()
+        second = self.pool.acquire()
+        self.pool.release(first)
+        other = []
+        thread = threading.Thread(target=lambda: other.append(self.pool.acquire()))
+        self.pool.release(second)
+        self.assertIs(self.pool.acquire(), second)
+        thread.start()
+        thread.join()
+        self.assertIs(other[0], first)
+        self.assertEqual(self.pool.stats["affinity_hits"], 1)
+
+    def test_size_limit_and_timeout(self):
+        """Borrowers beyond `size` wait, then give up with PoolTimeout"""
+        held = [self.pool.acquire(), self.pool.acquire()]
+        with self.assertRaises(PoolTimeout):
+            self.pool.acquire()
+        threading.Timer(0.05, self.pool.release, [held[0]]).start()
+        self.assertIs(self.pool.acquire(), held[0])
+        self.assertEqual(self.pool.stats["connects"], 2)
+
+    def test_release_rolls_back_open_transaction(self):
+        """Uncommitted work is not handed to the next borrower"""
+        with borrow(self.pool) as conn:
+            conn.execute("CREATE TABLE users (id INTEGER)")
+        with borrow(self.pool) as conn:
+            conn.execute("INSERT INTO users VALUES (1)")
+            self.assertTrue(conn.in_transaction)
+        with borrow(self.pool) as conn:
+            self.assertFalse(conn.in_transaction)
+            self.assertEqual(conn.execute("SELECT COUNT(*) FROM users").fetchone()[0], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,21 +1,21 @@
-import mysql.connector
+from db_pool import close_stream, get_connection
+from row_factories import make_row_factory
 
-def stream_users():
-    """Generator function to stream user_data rows one by one."""
-    connection = mysql.connector.connect(
-        host="localhost",
-        user="root",
-        password="",
-        database="ALX_prodev"
-    )
-    cursor = connection.cursor(cursor_class=mysql.connector.cursor.SSCursor)
+def stream_users(row_factory="dict"):
+    """Generator function to stream user_data rows one by one.
+
+    `row_factory` picks the row type: "dict", "tuple", "record" or "view"
+    (see row_factories.py).
+    """
+    connection = get_connection()
+    cursor = connection.cursor()
     
     try:
         cursor.execute("SELECT * FROM user_data")
         columns = [col[0] for col in cursor.description]
-        
+        make_row = make_row_factory(columns, row_factory)
+
         for row in cursor:
-            yield dict(zip(columns, row))
+            yield make_row(row)
     finally:
-        cursor.close()
-        connection.close()
\ No newline at end of file
+        close_stream(cursor, connection)
\ No newline at end of file
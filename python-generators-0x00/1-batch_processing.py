@@ -1,32 +1,228 @@
-import mysql.connector
-
-def stream_users_in_batches(batch_size):
-    """Generator to fetch user data in batches from the database."""
-    connection = mysql.connector.connect(
-        host="localhost",
-        user="root",
-        password="",
-        database="ALX_prodev"
-    )
-    cursor = connection.cursor(cursor_class=mysql.connector.cursor.SSCursor)
-    cursor.execute("SELECT * FROM user_data")
-    columns = [col[0] for col in cursor.description]
-    
+import queue
+import threading
+from db_pool import close_stream, get_connection
+from row_factories import make_row_factory
+
+try:
+    import numpy as np
+except ImportError:  # numpy is only needed for the columnar batches
+    np = None
+
+NUMERIC_COLUMNS = {"age": "int64"}
+COLUMNS = ("user_id", "name", "email", "age")
+OPERATORS = ("=", "!=", "<", "<=", ">", ">=")
+
+def stream_users_in_batches(batch_size, query="SELECT * FROM user_data",
+                            params=(), row_factory="dict"):
+    """Generator to fetch user data in batches from the database.
+
+    `row_factory` picks the row type: "dict", "tuple" or "record". A
+    reusable "view" cannot be held in a batch, so it is rejected.
+    """
+    if row_factory == "view":
+        raise ValueError("Batches cannot hold reusable row views")
+    connection = get_connection()
+    cursor = connection.cursor()
+
     try:
+        cursor.execute(query, params)
+        columns = [col[0] for col in cursor.description]
+        make_row = make_row_factory(columns, row_factory)
+
         while True:
             rows = cursor.fetchmany(batch_size)
             if not rows:
                 break
-            batch = [dict(zip(columns, row)) for row in rows]
+            batch = [make_row(row) for row in rows]
             yield batch
     finally:
-        cursor.close()
-        connection.close()
+        close_stream(cursor, connection)
+
+def read_ahead(batches, depth=2):
+    """Consume a batch generator on a background thread, `depth` ahead.
+
+    While the caller works on batch N the thread is already fetching
+    batch N+1. At most `depth` batches are buffered; after that the
+    thread blocks until the caller catches up. Closing the returned
+    generator early stops the thread and closes `batches`.
+    """
+    buffer = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+    done = object()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for batch in batches:
+                if not put(batch):
+                    return
+            put(done)
+        except Exception as err:
+            put(err)
+        finally:
+            try:
+                batches.close()
+            except Exception:
+                # nobody is left to hear about it once the caller has gone;
+                # the stream's own finally has released its connection
+                pass
+
+    worker = threading.Thread(target=produce, daemon=True)
+    worker.start()
+    try:
+        while True:
+            item = buffer.get()
+            if item is done:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        stop.set()
+        worker.join()
+
+def stream_users_read_ahead(batch_size, depth=2):
+    """stream_users_in_batches with the next batches fetched in the background."""
+    yield from read_ahead(stream_users_in_batches(batch_size), depth)
+
+def rows_to_columns(columns, rows):
+    """Transpose fetched rows into a dict of NumPy arrays, one per column.
+
+    Numeric columns become typed arrays. Text columns become fixed-width
+    UTF-8 byte arrays (dtype "S"), one byte per ASCII character instead
+    of the four a unicode array spends; decode a column with
+    np.char.decode(values, "utf-8") when str values are needed.
+    """
+    if np is None:
+        raise ImportError("Columnar batches require numpy")
+    values = list(zip(*rows))
+    batch = {}
+    for column, column_values in zip(columns, values):
+        dtype = NUMERIC_COLUMNS.get(column)
+        if dtype:
+            batch[column] = np.fromiter(
+                (int(value) for value in column_values),
+                dtype=dtype, count=len(column_values)
+            )
+        else:
+            batch[column] = np.array(
+                [str(value).encode("utf-8") for value in column_values],
+                dtype=bytes
+            )
+    return batch
+
+def stream_users_in_columns(batch_size):
+    """Generator to fetch user data as columnar NumPy batches."""
+    if np is None:
+        raise ImportError("Columnar batches require numpy")
+    connection = get_connection()
+    cursor = connection.cursor()
+
+    try:
+        cursor.execute("SELECT * FROM user_data")
+        columns = [col[0] for col in cursor.description]
+
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield rows_to_columns(columns, rows)
+    finally:
+        close_stream(cursor, connection)
+
+class Pipeline:
+    """Composable filter and projection over the user_data batch stream.
+
+    Column comparisons added with where() and the column list given to
+    select() are compiled into the SQL statement. Arbitrary callables
+    added with filter() run in Python on the rows that come back. Every
+    method returns a new pipeline, so partial pipelines can be shared.
+    """
+
+    def __init__(self, columns=None, predicates=(), filters=()):
+        self.columns = tuple(columns) if columns else COLUMNS
+        self.predicates = tuple(predicates)
+        self.filters = tuple(filters)
+
+    def select(self, *columns):
+        """Keep only `columns` in the yielded rows."""
+        for column in columns:
+            self._check_column(column)
+        return Pipeline(columns, self.predicates, self.filters)
+
+    def where(self, column, op, value):
+        """Add a `column op value` predicate that runs inside MySQL."""
+        self._check_column(column)
+        if op not in OPERATORS:
+            raise ValueError(f"Unsupported operator: {op!r}")
+        return Pipeline(
+            self.columns, self.predicates + ((column, op, value),),
+            self.filters
+        )
+
+    def filter(self, func, columns=()):
+        """Add a Python predicate over rows; list the columns it reads."""
+        for column in columns:
+            self._check_column(column)
+        return Pipeline(
+            self.columns, self.predicates,
+            self.filters + ((func, tuple(columns)),)
+        )
+
+    @staticmethod
+    def _check_column(column):
+        if column not in COLUMNS:
+            raise ValueError(f"Unknown column: {column!r}")
+
+    def fetched_columns(self):
+        """Selected columns plus any the Python filters need."""
+        fetched = list(self.columns)
+        for _, columns in self.filters:
+            fetched += [column for column in columns if column not in fetched]
+        return fetched
+
+    def sql(self):
+        """Return the (query, params) pair the pipeline pushes down."""
+        query = f"SELECT {', '.join(self.fetched_columns())} FROM user_data"
+        if self.predicates:
+            query += " WHERE " + " AND ".join(
+                f"{column} {op} %s" for column, op, _ in self.predicates
+            )
+        return query, tuple(value for _, _, value in self.predicates)
+
+    def batches(self, batch_size):
+        """Generator of filtered, projected batches (lists of dicts)."""
+        query, params = self.sql()
+        trim = len(self.fetched_columns()) != len(self.columns)
+        for batch in stream_users_in_batches(batch_size, query, params):
+            for func, _ in self.filters:
+                batch = [row for row in batch if func(row)]
+            if trim:
+                batch = [{column: row[column] for column in self.columns}
+                         for row in batch]
+            if batch:
+                yield batch
+
+    def rows(self, batch_size):
+        """Generator of the individual rows from batches()."""
+        for batch in self.batches(batch_size):
+            yield from batch
 
 def batch_processing(batch_size):
     """Process each batch to filter users over the age of 25."""
-    for batch in stream_users_in_batches(batch_size):
-        for user in batch:
-            if user['age'] > 25:
-                yield user
-                return user
\ No newline at end of file
+    yield from Pipeline().where("age", ">", 25).rows(batch_size)
+
+def batch_processing_columnar(batch_size, min_age=25):
+    """Yield columnar batches holding only users older than `min_age`."""
+    for batch in stream_users_in_columns(batch_size):
+        mask = batch["age"] > min_age
+        if mask.any():
+            yield {column: values[mask] for column, values in batch.items()}
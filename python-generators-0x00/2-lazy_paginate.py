@@ -1,30 +1,109 @@
 #!/usr/bin/python3
-import mysql.connector
+import base64
+from db_pool import get_connection
+from row_factories import make_row_factory
 
-def paginate_users(page_size, offset):
+OFFSET_QUERY = "SELECT * FROM user_data LIMIT %s OFFSET %s"
+# '' sorts before every user_id, so the first page uses the same statement
+KEYSET_QUERY = (
+    "SELECT * FROM user_data WHERE user_id > %s ORDER BY user_id LIMIT %s"
+)
+
+def fetch_page(cursor, query, params):
+    """Run a page query on `cursor` and return its rows as dicts."""
+    cursor.execute(query, params)
+    make_row = make_row_factory([col[0] for col in cursor.description])
+    return [make_row(row) for row in cursor.fetchall()]
+
+def paginate_users(page_size, offset, connection=None):
     """Fetch a page of users from the database with LIMIT/OFFSET."""
-    connection = mysql.connector.connect(
-        host="localhost",
-        user="root",
-        password="",
-        database="ALX_prodev"
-    )
-    cursor = connection.cursor(dictionary=True)
-    cursor.execute(
-        "SELECT * FROM user_data LIMIT %s OFFSET %s", 
-        (page_size, offset)
-    )
-    page = cursor.fetchall()
-    cursor.close()
-    connection.close()
-    return page
-
-def lazy_paginate(page_size):
-    """Generator to lazily paginate users in chunks of `page_size`."""
-    offset = 0
-    while True:
-        page = paginate_users(page_size, offset)
-        if not page:
-            break
-        yield page
-        offset += page_size
\ No newline at end of file
+    owns_connection = connection is None
+    if owns_connection:
+        connection = get_connection()
+    cursor = connection.cursor()
+    try:
+        return fetch_page(cursor, OFFSET_QUERY, (page_size, offset))
+    finally:
+        cursor.close()
+        if owns_connection:
+            connection.close()
+
+def paginate_users_after(page_size, after_id=None, connection=None):
+    """Fetch the page of users whose user_id sorts after `after_id`.
+
+    Seeks on the primary key instead of skipping rows, so every page
+    costs the same no matter how deep into the table it is.
+    """
+    owns_connection = connection is None
+    if owns_connection:
+        connection = get_connection()
+    cursor = connection.cursor()
+    try:
+        return fetch_page(cursor, KEYSET_QUERY, (after_id or '', page_size))
+    finally:
+        cursor.close()
+        if owns_connection:
+            connection.close()
+
+def encode_cursor(user_id):
+    """Turn the last user_id of a page into an opaque resume token."""
+    return base64.urlsafe_b64encode(user_id.encode()).decode()
+
+def decode_cursor(token):
+    """Recover the user_id stored in a resume token."""
+    try:
+        return base64.urlsafe_b64decode(token.encode()).decode()
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError(f"Invalid pagination cursor: {token!r}")
+
+def page_cursor(page):
+    """Return the token that resumes pagination right after `page`."""
+    return encode_cursor(page[-1]['user_id']) if page else None
+
+def lazy_paginate(page_size, mode="offset", cursor=None, stats=None):
+    """Generator to lazily paginate users in chunks of `page_size`.
+
+    mode="offset" walks the table with LIMIT/OFFSET. mode="keyset" seeks
+    on user_id and can resume from a token returned by page_cursor().
+
+    One pooled connection and one prepared statement serve every page.
+    Pass a dict as `stats` to have it filled with the number of new
+    connects made and pages fetched.
+    """
+    if mode not in ("offset", "keyset"):
+        raise ValueError(f"Unknown pagination mode: {mode!r}")
+    if cursor is not None and mode != "keyset":
+        raise ValueError("Resume cursors are only supported in keyset mode")
+    if stats is None:
+        stats = {}
+    stats.update(connects=0, pages=0)
+
+    connection = get_connection()
+    stats["connects"] += int(connection.fresh)
+    statement = connection.cursor(prepared=True)
+    try:
+        if mode == "keyset":
+            after_id = decode_cursor(cursor) if cursor else ''
+            while True:
+                page = fetch_page(
+                    statement, KEYSET_QUERY, (after_id, page_size)
+                )
+                if not page:
+                    break
+                stats["pages"] += 1
+                yield page
+                after_id = page[-1]['user_id']
+        else:
+            offset = 0
+            while True:
+                page = fetch_page(
+                    statement, OFFSET_QUERY, (page_size, offset)
+                )
+                if not page:
+                    break
+                stats["pages"] += 1
+                yield page
+                offset += page_size
+    finally:
+        statement.close()
+        connection.close()
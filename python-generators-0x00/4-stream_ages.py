@@ -1,26 +1,180 @@
 #!/usr/bin/python3
-import mysql.connector
+import math
+import re
+from collections import Counter
+from converters import make_value_converter
+from db_pool import close_stream, get_connection
+
+NUMERIC_COLUMNS = ("age",)
+PERCENTILE = re.compile(r"^p(\d{1,2}(?:\.\d+)?|100)$")
+
+def stream_column(column, connection=None):
+    """Generator to stream one numeric column of user_data value by value."""
+    if column not in NUMERIC_COLUMNS:
+        raise ValueError(f"Cannot aggregate column {column!r}")
+    owns_connection = connection is None
+    if owns_connection:
+        connection = get_connection()
+    cursor = connection.cursor()
+    convert = make_value_converter(column)
 
-def stream_user_ages():
-    """Generator to stream user ages one by one from the database."""
-    connection = mysql.connector.connect(
-        host="localhost",
-        user="root",
-        password="",
-        database="ALX_prodev"
-    )
-    cursor = connection.cursor(cursor_class=mysql.connector.cursor.SSCursor)
-    cursor.execute("SELECT age FROM user_data")
-    
     try:
-        for (age,) in cursor:
-            yield age
+        cursor.execute(f"SELECT {column} FROM user_data")
+        for (value,) in cursor:
+            yield convert(value)
     finally:
-        cursor.close()
-        connection.close()
+        close_stream(cursor, connection if owns_connection else None)
+
+def stream_user_ages():
+    """Generator to stream user ages one by one from the database."""
+    yield from stream_column("age")
+
+class Count:
+    def __init__(self):
+        self.count = 0
+
+    def add(self, value):
+        self.count += 1
+
+    def result(self):
+        return self.count
+
+class Sum:
+    def __init__(self):
+        self.total = 0
+
+    def add(self, value):
+        self.total += value
+
+    def result(self):
+        return self.total
+
+class Mean:
+    def __init__(self):
+        self.total = 0
+        self.count = 0
+
+    def add(self, value):
+        self.total += value
+        self.count += 1
+
+    def result(self):
+        return float(self.total / self.count) if self.count else 0.0
+
+class Min:
+    def __init__(self):
+        self.value = None
+
+    def add(self, value):
+        if self.value is None or value < self.value:
+            self.value = value
+
+    def result(self):
+        return self.value
+
+class Max(Min):
+    def add(self, value):
+        if self.value is None or value > self.value:
+            self.value = value
+
+class Percentile:
+    """Exact nearest-rank percentile, holding one counter per distinct value."""
+
+    def __init__(self, q):
+        self.q = q
+        self.counts = Counter()
+
+    def add(self, value):
+        self.counts[value] += 1
+
+    def result(self):
+        total = sum(self.counts.values())
+        if not total:
+            return None
+        rank = max(1, math.ceil(self.q / 100 * total))
+        seen = 0
+        for value in sorted(self.counts):
+            seen += self.counts[value]
+            if seen >= rank:
+                return value
+
+# name -> (SQL template or None, streaming accumulator factory)
+AGGREGATES = {
+    "count": ("COUNT({})", Count),
+    "sum": ("SUM({})", Sum),
+    "avg": ("AVG({})", Mean),
+    "min": ("MIN({})", Min),
+    "max": ("MAX({})", Max),
+}
+
+def register_aggregate(name, factory, sql=None):
+    """Add an aggregate; give `sql` (e.g. "STDDEV({})") to push it down."""
+    AGGREGATES[name] = (sql, factory)
+
+def resolve(name):
+    """Return the (sql, factory) pair for an aggregate name like "p95"."""
+    if name in AGGREGATES:
+        return AGGREGATES[name]
+    match = PERCENTILE.match(name)
+    if match:
+        q = float(match.group(1))
+        return None, lambda: Percentile(q)
+    raise ValueError(f"Unknown aggregate: {name!r}")
+
+def aggregate(names, column="age", pushdown=True, connection=None):
+    """Compute the named aggregates over a user_data column.
+
+    Aggregates with a SQL form run inside MySQL in one query; the rest
+    (percentiles, or everything when pushdown=False) share a single pass
+    over the streaming generator. Returns a dict keyed by name.
+    """
+    if column not in NUMERIC_COLUMNS:
+        raise ValueError(f"Cannot aggregate column {column!r}")
+    resolved = {name: resolve(name) for name in names}
+    pushed = [name for name, (sql, _) in resolved.items()
+              if pushdown and sql]
+    results = {}
+
+    if pushed:
+        owns_connection = connection is None
+        conn = get_connection() if owns_connection else connection
+        cursor = conn.cursor()
+        try:
+            select = ", ".join(
+                resolved[name][0].format(column) for name in pushed
+            )
+            cursor.execute(f"SELECT {select} FROM user_data")
+            row = cursor.fetchone()
+        finally:
+            cursor.close()
+            if owns_connection:
+                conn.close()
+        results.update(zip(pushed, row))
+        if "avg" in results:
+            results["avg"] = float(results["avg"] or 0.0)
+        # SUM comes back as a Decimal (NULL on an empty table); decode it
+        # like the streamed values so the result type matches Sum's
+        convert = make_value_converter(column)
+        if "sum" in results:
+            results["sum"] = convert(results["sum"] or 0)
+        for name in ("min", "max"):
+            if name in results:
+                results[name] = convert(results[name])
+
+    streamed = {name: factory() for name, (_, factory) in resolved.items()
+                if name not in results}
+    if streamed:
+        for value in stream_column(column, connection):
+            for accumulator in streamed.values():
+                accumulator.add(value)
+        for name, accumulator in streamed.items():
+            results[name] = accumulator.result()
+    return {name: results[name] for name in names}
 
-def compute_average_age():
-    """Compute the average age using the streaming generator."""
+def compute_average_age(pushdown=True):
+    """Compute the average age, letting MySQL do the work by default."""
+    if pushdown:
+        return aggregate(["avg"])["avg"]
     total_age = 0
     count = 0
     for age in stream_user_ages():
@@ -30,4 +184,4 @@ def compute_average_age():
 
 if __name__ == "__main__":
     average_age = compute_average_age()
-    print(f"Average age of users: {average_age:.2f}")
\ No newline at end of file
+    print(f"Average age of users: {average_age:.2f}")
@@ -0,0 +1,178 @@
+#!/usr/bin/python3
+"""Async generator versions of the user_data streams.
+
+Rows come from MySQL through aiomysql by default. Set ALX_DB_ASYNC=sqlite
+(and optionally ALX_DB_SQLITE_PATH) to read a local SQLite copy of
+user_data through aiosqlite instead, e.g. for tests. Every generator can
+also be handed an already open connection of either kind.
+"""
+import asyncio
+import os
+from db_pool import connect_args
+from row_factories import make_row_factory
+
+try:
+    import aiomysql
+except ImportError:  # only needed for the MySQL backend
+    aiomysql = None
+
+try:
+    import aiosqlite
+except ImportError:  # only needed for the SQLite backend
+    aiosqlite = None
+
+_DONE = object()
+
+
+async def connect():
+    """Open an async connection to the configured backend."""
+    if os.environ.get("ALX_DB_ASYNC", "mysql") == "sqlite":
+        if aiosqlite is None:
+            raise ImportError("The SQLite backend requires aiosqlite")
+        return await aiosqlite.connect(
+            os.environ.get("ALX_DB_SQLITE_PATH", "ALX_prodev.db")
+        )
+    if aiomysql is None:
+        raise ImportError("The MySQL backend requires aiomysql")
+    args = connect_args()
+    args["db"] = args.pop("database")
+    return await aiomysql.connect(**args)
+
+
+def _is_sqlite(connection):
+    return aiosqlite is not None and isinstance(
+        connection, aiosqlite.Connection
+    )
+
+
+async def _close(connection):
+    if _is_sqlite(connection):
+        await connection.close()
+    else:
+        connection.close()
+
+
+async def _execute(connection, query, params=()):
+    """Run `query` with %s placeholders and return an unbuffered cursor."""
+    if _is_sqlite(connection):
+        return await connection.execute(query.replace("%s", "?"), params)
+    cursor = await connection.cursor(aiomysql.SSCursor)
+    await cursor.execute(query, params)
+    return cursor
+
+
+async def _fetch_batches(connection, query, params, batch_size):
+    """Async generator of row-dict batches for one query."""
+    owns_connection = connection is None
+    if owns_connection:
+        connection = await connect()
+    try:
+        cursor = await _execute(connection, query, params)
+        make_row = make_row_factory([col[0] for col in cursor.description])
+        try:
+            while True:
+                rows = await cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield [make_row(row) for row in rows]
+        finally:
+            await cursor.close()
+    finally:
+        if owns_connection:
+            await _close(connection)
+
+
+async def prefetch(source, depth):
+    """Read ahead up to `depth` items of an async generator in a task.
+
+    The producer blocks once the queue is full, so a slow consumer never
+    causes more than `depth` items to be buffered.
+    """
+    queue = asyncio.Queue(maxsize=depth)
+
+    async def produce():
+        try:
+            async for item in source:
+                await queue.put(item)
+            await queue.put(_DONE)
+        except Exception as err:
+            await queue.put(err)
+
+    task = asyncio.create_task(produce())
+    try:
+        while True:
+            item = await queue.get()
+            if item is _DONE:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        await source.aclose()
+
+
+async def stream_users_in_batches(batch_size, prefetch_depth=0,
+                                  connection=None):
+    """Async generator of user_data batches, optionally read ahead."""
+    batches = _fetch_batches(
+        connection, "SELECT * FROM user_data", (), batch_size
+    )
+    if prefetch_depth:
+        batches = prefetch(batches, prefetch_depth)
+    try:
+        async for batch in batches:
+            yield batch
+    finally:
+        # async for does not close what it iterates; leaving early must
+        # still stop the read-ahead task and close the connection
+        await batches.aclose()
+
+
+async def stream_users(batch_size=500, prefetch_depth=0, connection=None):
+    """Async generator of user_data rows, fetched `batch_size` at a time."""
+    batches = stream_users_in_batches(batch_size, prefetch_depth, connection)
+    try:
+        async for batch in batches:
+            for row in batch:
+                yield row
+    finally:
+        await batches.aclose()
+
+
+async def lazy_paginate(page_size, mode="offset", after_id=None,
+                        connection=None):
+    """Async generator of user_data pages, by offset or keyset on user_id."""
+    if mode not in ("offset", "keyset"):
+        raise ValueError(f"Unknown pagination mode: {mode!r}")
+    owns_connection = connection is None
+    if owns_connection:
+        connection = await connect()
+    try:
+        offset = 0
+        after_id = after_id or ''
+        while True:
+            if mode == "keyset":
+                query = ("SELECT * FROM user_data WHERE user_id > %s "
+                         "ORDER BY user_id LIMIT %s")
+                params = (after_id, page_size)
+            else:
+                query = "SELECT * FROM user_data LIMIT %s OFFSET %s"
+                params = (page_size, offset)
+            page = []
+            async for batch in _fetch_batches(
+                connection, query, params, page_size
+            ):
+                page.extend(batch)
+            if not page:
+                break
+            yield page
+            offset += page_size
+            after_id = page[-1]['user_id']
+    finally:
+        if owns_connection:
+            await _close(connection)
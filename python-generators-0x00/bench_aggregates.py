@@ -0,0 +1,51 @@
+#!/usr/bin/python3
+"""Compare pushed-down SQL aggregates with streaming them through Python.
+
+Reports wall time and the bytes the server sent for each path, read from
+the session's Bytes_sent counter.
+
+Usage: ./bench_aggregates.py [aggregate ...]   (default: count sum avg min max)
+"""
+import sys
+import time
+import mysql.connector
+from db_pool import get_connection
+
+stream_ages = __import__('4-stream_ages')
+
+
+def bytes_sent(connection):
+    cursor = connection.cursor()
+    cursor.execute("SHOW SESSION STATUS LIKE 'Bytes_sent'")
+    (_, value) = cursor.fetchone()
+    cursor.close()
+    return int(value)
+
+
+def measure(connection, names, pushdown):
+    before = bytes_sent(connection)
+    start = time.perf_counter()
+    result = stream_ages.aggregate(names, pushdown=pushdown,
+                                   connection=connection)
+    elapsed = time.perf_counter() - start
+    transferred = bytes_sent(connection) - before
+    return result, elapsed, transferred
+
+
+def main(names):
+    connection = get_connection()
+    # Bytes_sent also counts the reply to the status query itself
+    first = bytes_sent(connection)
+    overhead = bytes_sent(connection) - first
+    for label, pushdown in (("pushdown", True), ("streaming", False)):
+        result, elapsed, transferred = measure(connection, names, pushdown)
+        print(f"{label:<10} {elapsed * 1000:>10.2f} ms "
+              f"{transferred - overhead:>14,} bytes  {result}")
+    connection.close()
+
+
+if __name__ == "__main__":
+    try:
+        main(sys.argv[1:] or ["count", "sum", "avg", "min", "max"])
+    except mysql.connector.Error as err:
+        print(f"Benchmark failed: {err}")
@@ -0,0 +1,67 @@
+#!/usr/bin/python3
+"""Compare memory and build time of dict batches against columnar batches.
+
+Fetches one batch of raw rows from user_data, then builds it both as a
+list of dicts and as NumPy columns, reporting the memory each result
+holds (via tracemalloc) and the time to build and filter it on age > 25.
+
+Usage: ./bench_batches.py [batch_size]
+"""
+import sys
+import time
+import tracemalloc
+import mysql.connector
+from db_pool import get_connection
+
+batch_processing = __import__('1-batch_processing')
+
+
+def fetch_rows(batch_size):
+    connection = get_connection()
+    cursor = connection.cursor(buffered=True)
+    cursor.execute("SELECT * FROM user_data LIMIT %s", (batch_size,))
+    columns = [col[0] for col in cursor.description]
+    rows = cursor.fetchall()
+    cursor.close()
+    connection.close()
+    return columns, rows
+
+
+def measure(build, filter_batch):
+    tracemalloc.start()
+    start = time.perf_counter()
+    batch = build()
+    built = time.perf_counter() - start
+    held, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    start = time.perf_counter()
+    filter_batch(batch)
+    filtered = time.perf_counter() - start
+    return held, built, filtered
+
+
+def main(batch_size=100000):
+    columns, rows = fetch_rows(batch_size)
+    print(f"{len(rows)} rows per batch")
+    results = {
+        "dicts": measure(
+            lambda: [dict(zip(columns, row)) for row in rows],
+            lambda batch: [user for user in batch if user['age'] > 25],
+        ),
+        "columns": measure(
+            lambda: batch_processing.rows_to_columns(columns, rows),
+            lambda batch: {column: values[batch["age"] > 25]
+                           for column, values in batch.items()},
+        ),
+    }
+    for label, (held, built, filtered) in results.items():
+        print(f"{label:<8} {held / 1024:>10,.0f} KiB "
+              f"build {built * 1000:>8.2f} ms "
+              f"filter {filtered * 1000:>8.2f} ms")
+
+
+if __name__ == "__main__":
+    try:
+        main(*(int(arg) for arg in sys.argv[1:2]))
+    except mysql.connector.Error as err:
+        print(f"Benchmark failed: {err}")
@@ -0,0 +1,47 @@
+#!/usr/bin/python3
+"""Compare aggregating ages as decimal.Decimal against native ints.
+
+Builds the same ages as a list of Decimal (what a DECIMAL column returns)
+and a list of int (TINYINT, or the "age" converter), then times the
+average computed by compute_average_age and the age > 25 filter used by
+batch_processing over each.
+
+Usage: ./bench_decimal.py [rows]
+"""
+import random
+import sys
+import time
+from decimal import Decimal
+
+
+def average(ages):
+    total_age = 0
+    count = 0
+    for age in ages:
+        total_age += age
+        count += 1
+    return total_age / count if count else 0.0
+
+
+def over_25(ages):
+    return sum(1 for age in ages if age > 25)
+
+
+def timed(func, ages):
+    start = time.perf_counter()
+    func(ages)
+    return time.perf_counter() - start
+
+
+def main(rows=1000000):
+    ints = [random.randint(1, 120) for _ in range(rows)]
+    decimals = [Decimal(age) for age in ints]
+    print(f"{rows} ages")
+    print(f"{'type':>8} {'average (ms)':>13} {'age > 25 (ms)':>14}")
+    for label, ages in (("Decimal", decimals), ("int", ints)):
+        print(f"{label:>8} {timed(average, ages) * 1000:>13.1f} "
+              f"{timed(over_25, ages) * 1000:>14.1f}")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:2]))
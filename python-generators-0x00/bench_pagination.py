@@ -0,0 +1,83 @@
+#!/usr/bin/python3
+"""Compare LIMIT/OFFSET and keyset pagination over a large user_data table.
+
+Seeds user_data up to the requested row count with synthetic users, then
+times a single page fetch at increasing depths with both strategies.
+
+Usage: ./bench_pagination.py [rows] [page_size]
+"""
+import sys
+import time
+import uuid
+import mysql.connector
+
+lazy_paginate = __import__('2-lazy_paginate')
+seed = __import__('seed')
+
+
+def fill_table(connection, rows):
+    """Top user_data up to `rows` rows with synthetic users."""
+    cursor = connection.cursor()
+    cursor.execute("SELECT COUNT(*) FROM user_data")
+    (existing,) = cursor.fetchone()
+    missing = rows - existing
+    while missing > 0:
+        chunk = min(missing, 10000)
+        cursor.executemany(
+            "INSERT INTO user_data (user_id, name, email, age) "
+            "VALUES (%s, %s, %s, %s)",
+            [
+                (str(uuid.uuid4()), f"User {i}", f"user{i}@example.com",
+                 18 + i % 80)
+                for i in range(chunk)
+            ]
+        )
+        connection.commit()
+        missing -= chunk
+    cursor.close()
+    return max(existing, rows)
+
+
+def key_at(connection, offset):
+    """Return the user_id sitting just before position `offset`."""
+    if offset == 0:
+        return None
+    cursor = connection.cursor()
+    cursor.execute(
+        "SELECT user_id FROM user_data ORDER BY user_id LIMIT 1 OFFSET %s",
+        (offset - 1,)
+    )
+    (user_id,) = cursor.fetchone()
+    cursor.close()
+    return user_id
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def main(rows=1000000, page_size=1000):
+    connection = seed.connect_to_prodev()
+    seed.create_table(connection)
+    total = fill_table(connection, rows)
+    print(f"user_data rows: {total}, page size: {page_size}")
+    print(f"{'depth':>10} {'offset (ms)':>12} {'keyset (ms)':>12}")
+    for fraction in (0, 0.1, 0.25, 0.5, 0.75, 0.99):
+        depth = int(total * fraction)
+        after_id = key_at(connection, depth)
+        offset_time = timed(lazy_paginate.paginate_users, page_size, depth)
+        keyset_time = timed(
+            lazy_paginate.paginate_users_after, page_size, after_id
+        )
+        print(f"{depth:>10} {offset_time * 1000:>12.2f} "
+              f"{keyset_time * 1000:>12.2f}")
+    connection.close()
+
+
+if __name__ == "__main__":
+    try:
+        main(*(int(arg) for arg in sys.argv[1:3]))
+    except mysql.connector.Error as err:
+        print(f"Benchmark failed: {err}")
@@ -0,0 +1,33 @@
+#!/usr/bin/python3
+"""Time full user_data scans with 1, 2, 4 and 8 range partitions.
+
+Usage: ./bench_partitioned_scan.py [batch_size]
+"""
+import sys
+import time
+import mysql.connector
+from partitioned_scan import partitioned_scan
+
+
+def main(batch_size=1000):
+    baseline = None
+    print(f"{'workers':>7} {'order':>9} {'rows':>10} {'seconds':>8} "
+          f"{'speedup':>8}")
+    for ordered in (False, True):
+        for workers in (1, 2, 4, 8):
+            start = time.perf_counter()
+            rows = sum(1 for _ in partitioned_scan(workers, ordered,
+                                                   batch_size))
+            elapsed = time.perf_counter() - start
+            if workers == 1:
+                baseline = elapsed
+            label = "ordered" if ordered else "unordered"
+            print(f"{workers:>7} {label:>9} {rows:>10} {elapsed:>8.2f} "
+                  f"{baseline / elapsed:>7.2f}x")
+
+
+if __name__ == "__main__":
+    try:
+        main(*(int(arg) for arg in sys.argv[1:2]))
+    except mysql.connector.Error as err:
+        print(f"Benchmark failed: {err}")
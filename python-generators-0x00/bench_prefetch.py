@@ -0,0 +1,42 @@
+#!/usr/bin/python3
+"""Show how read-ahead overlaps fetching with a slow batch consumer.
+
+Walks user_data once with plain stream_users_in_batches and once with
+stream_users_read_ahead, sleeping `delay` ms per batch to stand in for
+real processing.
+
+Usage: ./bench_prefetch.py [batch_size] [delay_ms] [depth]
+"""
+import sys
+import time
+import mysql.connector
+
+batch_processing = __import__('1-batch_processing')
+
+
+def walk(batches, delay):
+    start = time.perf_counter()
+    count = 0
+    for batch in batches:
+        count += len(batch)
+        time.sleep(delay)
+    return count, time.perf_counter() - start
+
+
+def main(batch_size=1000, delay_ms=20, depth=2):
+    delay = delay_ms / 1000
+    runs = (
+        ("plain", batch_processing.stream_users_in_batches(batch_size)),
+        (f"read-ahead x{depth}",
+         batch_processing.stream_users_read_ahead(batch_size, depth)),
+    )
+    for label, batches in runs:
+        count, elapsed = walk(batches, delay)
+        print(f"{label:<16} {count:>9} rows {elapsed:>8.2f}s")
+
+
+if __name__ == "__main__":
+    try:
+        main(*(int(arg) for arg in sys.argv[1:4]))
+    except mysql.connector.Error as err:
+        print(f"Benchmark failed: {err}")
@@ -0,0 +1,77 @@
+#!/usr/bin/python3
+"""Compare the row-at-a-time insert_data loop with the bulk loaders.
+
+Scales user_data.csv up to the requested row count (with a user_id per
+row so every loader inserts everything) and loads it into a scratch
+ALX_prodev_bench database, emptying user_data between runs.
+
+Usage: ./bench_seed.py [rows] [chunk_size]
+"""
+import csv
+import os
+import sys
+import tempfile
+import time
+import uuid
+
+os.environ.setdefault("ALX_DB_NAME", "ALX_prodev_bench")
+
+import mysql.connector
+import seed
+
+
+def scale_csv(source, rows, target):
+    """Write `rows` users to `target`, cycling through `source`."""
+    with open(source, newline='') as file:
+        users = [row for row in csv.reader(file)
+                 if len(row) == 3 and row[-1] != "age"]
+    with open(target, 'w', newline='') as file:
+        writer = csv.writer(file, quoting=csv.QUOTE_ALL)
+        for i in range(rows):
+            writer.writerow([str(uuid.uuid4())] + users[i % len(users)])
+
+
+def reset_table():
+    connection = seed.connect_db()
+    cursor = connection.cursor()
+    cursor.execute(f"CREATE DATABASE IF NOT EXISTS {os.environ['ALX_DB_NAME']}")
+    cursor.execute(f"USE {os.environ['ALX_DB_NAME']}")
+    seed.create_table(connection)
+    cursor.execute("TRUNCATE TABLE user_data")
+    cursor.close()
+    connection.close()
+
+
+def run(label, load):
+    reset_table()
+    connection = seed.connect_to_prodev()
+    start = time.perf_counter()
+    load(connection)
+    elapsed = time.perf_counter() - start
+    connection.close()
+    print(f"{label:<24} {elapsed:>8.2f}s")
+
+
+def main(rows=100000, chunk_size=1000):
+    source = os.path.join(os.path.dirname(__file__), "user_data.csv")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "users.csv")
+        scale_csv(source, rows, path)
+        print(f"Loading {rows} rows, chunk size {chunk_size}")
+        run("insert_data (per row)",
+            lambda conn: seed.insert_data(conn, path))
+        run("bulk_insert_data",
+            lambda conn: seed.bulk_insert_data(conn, path, chunk_size))
+        run(f"parallel ({os.cpu_count()} procs)",
+            lambda conn: seed.parallel_insert_data(path,
+                                                   chunk_size=chunk_size))
+        run("LOAD DATA LOCAL INFILE",
+            lambda conn: seed.bulk_insert_data(conn, path,
+                                               use_load_data=True))
+
+
+if __name__ == "__main__":
+    try:
+        main(*(int(arg) for arg in sys.argv[1:3]))
+    except mysql.connector.Error as err:
+        print(f"Benchmark failed: {err}")
@@ -0,0 +1,179 @@
+#!/usr/bin/python3
+"""Export user_data into compact columnar files and read them back via mmap.
+
+Each export chunk becomes one users-NNNNN.ucol file:
+
+    b"UCOL1\\n" | header length (uint32 LE) | JSON header | column blocks
+
+The JSON header lists the row count and, per column, its type, codec and
+the offset/length of its block. Integer columns are stored as raw int32
+arrays aligned to 8 bytes so a reader can view them straight out of the
+memory map. Text columns are zlib-compressed: a uint32 offset table
+followed by the concatenated UTF-8 values.
+
+Only one chunk is held in memory while exporting.
+
+Usage: ./columnar_export.py <out_dir> [rows_per_file]
+       ./columnar_export.py --average <out_dir>
+"""
+import glob
+import json
+import mmap
+import os
+import struct
+import sys
+import zlib
+from array import array
+
+batch_processing = __import__('1-batch_processing')
+
+MAGIC = b"UCOL1\n"
+SCHEMA = {"user_id": "str", "name": "str", "email": "str", "age": "int32"}
+
+
+def encode_column(kind, values):
+    """Return (codec, bytes) for one column block."""
+    if kind == "int32":
+        return "raw", array("i", (int(value) for value in values)).tobytes()
+    encoded = [str(value).encode("utf-8") for value in values]
+    offsets = array("I", [0])
+    for item in encoded:
+        offsets.append(offsets[-1] + len(item))
+    return "zlib", zlib.compress(offsets.tobytes() + b"".join(encoded))
+
+
+def write_chunk(path, rows):
+    """Write a list of row dicts as one columnar file."""
+    columns = []
+    blocks = []
+    position = 0
+    for name, kind in SCHEMA.items():
+        codec, block = encode_column(kind, (row[name] for row in rows))
+        padding = -position % 8
+        blocks.append(b"\0" * padding + block)
+        position += padding
+        columns.append({"name": name, "type": kind, "codec": codec,
+                        "offset": position, "length": len(block)})
+        position += len(block)
+    header = json.dumps({"rows": len(rows), "byteorder": sys.byteorder,
+                         "columns": columns}).encode()
+    # Start the blocks on an 8-byte boundary of the file as well
+    prefix = len(MAGIC) + 4 + len(header)
+    header += b" " * (-prefix % 8)
+    with open(path, "wb") as file:
+        file.write(MAGIC)
+        file.write(struct.pack("<I", len(header)))
+        file.write(header)
+        for block in blocks:
+            file.write(block)
+
+
+def export_columnar(out_dir, rows_per_file=100000):
+    """Stream user_data into columnar chunk files; return the row count."""
+    os.makedirs(out_dir, exist_ok=True)
+    index = 0
+    total = 0
+    chunk = []
+    for batch in batch_processing.stream_users_in_batches(
+        min(rows_per_file, 10000)
+    ):
+        chunk.extend(batch)
+        while len(chunk) >= rows_per_file:
+            index += 1
+            write_chunk(os.path.join(out_dir, f"users-{index:05d}.ucol"),
+                        chunk[:rows_per_file])
+            total += rows_per_file
+            chunk = chunk[rows_per_file:]
+    if chunk:
+        index += 1
+        write_chunk(os.path.join(out_dir, f"users-{index:05d}.ucol"), chunk)
+        total += len(chunk)
+    return total
+
+
+class ColumnarFile:
+    """Memory-mapped reader for one .ucol file."""
+
+    def __init__(self, path):
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a columnar user export")
+        (length,) = struct.unpack_from("<I", self._map, len(MAGIC))
+        start = len(MAGIC) + 4
+        header = json.loads(self._map[start:start + length])
+        self._base = start + length
+        self.rows = header["rows"]
+        self._native = header["byteorder"] == sys.byteorder
+        self.columns = {column["name"]: column for column in header["columns"]}
+
+    def _block(self, name):
+        column = self.columns[name]
+        begin = self._base + column["offset"]
+        return column, memoryview(self._map)[begin:begin + column["length"]]
+
+    def column(self, name):
+        """Return a column: a zero-copy int view or a list of str.
+
+        Int views point into the memory map, so release them (or drop
+        every reference) before closing the file.
+        """
+        column, block = self._block(name)
+        if column["type"] == "int32":
+            if self._native:
+                return block.cast("i")
+            values = array("i", block)
+            values.byteswap()
+            return values
+        data = zlib.decompress(block)
+        offsets = array("I")
+        offsets.frombytes(data[:4 * (self.rows + 1)])
+        if not self._native:
+            offsets.byteswap()
+        text = data[4 * (self.rows + 1):]
+        return [text[offsets[i]:offsets[i + 1]].decode("utf-8")
+                for i in range(self.rows)]
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        return False
+
+
+def iter_files(out_dir):
+    """Yield an open ColumnarFile for every chunk in `out_dir`, in order."""
+    for path in sorted(glob.glob(os.path.join(out_dir, "users-*.ucol"))):
+        with ColumnarFile(path) as chunk:
+            yield chunk
+
+
+def average(out_dir, column="age"):
+    """Average an integer column across an export without touching MySQL."""
+    total = 0
+    count = 0
+    for chunk in iter_files(out_dir):
+        values = chunk.column(column)
+        total += sum(values)
+        count += len(values)
+        if isinstance(values, memoryview):
+            values.release()
+    return total / count if count else 0.0
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3 and sys.argv[1] == "--average":
+        print(f"Average age of users: {average(sys.argv[2]):.2f}")
+    elif len(sys.argv) in (2, 3) and not sys.argv[1].startswith("-"):
+        rows = export_columnar(sys.argv[1],
+                               *(int(arg) for arg in sys.argv[2:3]))
+        print(f"Exported {rows} rows to {sys.argv[1]}")
+    else:
+        print(__doc__.split("Usage: ")[1].strip())
+        sys.exit(1)
@@ -0,0 +1,43 @@
+#!/usr/bin/python3
+"""Per-column value converters applied by the user_data generators.
+
+The driver hands DECIMAL columns back as decimal.Decimal, which is slow to
+add up and compare. Converters registered here decode a column into a
+native Python type as rows are streamed. `age` is registered as int, which
+also covers tables created before it became a TINYINT (see
+seed.migrate_age_to_int).
+"""
+
+CONVERTERS = {"age": int}
+
+
+def register_converter(column, func):
+    """Decode `column` with `func` in every generator; None removes it."""
+    if func is None:
+        CONVERTERS.pop(column, None)
+    else:
+        CONVERTERS[column] = func
+
+
+def make_row_converter(columns):
+    """Return a tuple -> tuple converter for `columns`, or None if no-op."""
+    funcs = [CONVERTERS.get(column) for column in columns]
+    if not any(funcs):
+        return None
+    steps = [(i, func) for i, func in enumerate(funcs) if func]
+
+    def convert(row):
+        row = list(row)
+        for i, func in steps:
+            if row[i] is not None:
+                row[i] = func(row[i])
+        return tuple(row)
+    return convert
+
+
+def make_value_converter(column):
+    """Return the converter for a single streamed column (identity if none)."""
+    func = CONVERTERS.get(column)
+    if func is None:
+        return lambda value: value
+    return lambda value: value if value is None else func(value)
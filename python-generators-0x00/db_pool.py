@@ -0,0 +1,220 @@
+#!/usr/bin/python3
+"""Shared MySQL connection pool for the ALX_prodev generators.
+
+Connection settings and pool limits come from the environment:
+
+    ALX_DB_HOST, ALX_DB_PORT, ALX_DB_USER, ALX_DB_PASSWORD, ALX_DB_NAME
+    ALX_DB_POOL_SIZE          max open connections (default 5)
+    ALX_DB_POOL_IDLE_TIMEOUT  seconds a connection may sit idle (default 300)
+    ALX_DB_POOL_MAX_LIFETIME  seconds before a connection is retired
+                              (default 3600)
+    ALX_DB_POOL_TIMEOUT       seconds to wait for a free connection
+                              (default 30)
+
+Borrowed connections behave like plain mysql.connector connections;
+calling close() hands them back to the pool instead of disconnecting.
+"""
+import os
+import threading
+import time
+import mysql.connector
+from mysql.connector.errors import PoolError
+
+
+def connect_args(database=True):
+    """Return mysql.connector.connect() keyword arguments from the env."""
+    args = {
+        "host": os.environ.get("ALX_DB_HOST", "localhost"),
+        "port": int(os.environ.get("ALX_DB_PORT", "3306")),
+        "user": os.environ.get("ALX_DB_USER", "root"),
+        "password": os.environ.get("ALX_DB_PASSWORD", ""),
+    }
+    if database:
+        args["database"] = os.environ.get("ALX_DB_NAME", "ALX_prodev")
+    return args
+
+
+def connect(database=True):
+    """Open a new, unpooled connection using the env settings."""
+    return mysql.connector.connect(**connect_args(database))
+
+
+class PooledConnection:
+    """A borrowed connection that returns itself to its pool on close()."""
+
+    def __init__(self, pool, connection, created_at, fresh):
+        self._pool = pool
+        self._connection = connection
+        self.created_at = created_at
+        self.fresh = fresh
+
+    def __getattr__(self, name):
+        if self._connection is None:
+            raise PoolError("Connection was already returned to the pool")
+        return getattr(self._connection, name)
+
+    def close(self):
+        if self._connection is not None:
+            connection, self._connection = self._connection, None
+            self._pool.release(connection, self.created_at)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        return False
+
+
+class ConnectionPool:
+    """Thread-safe pool of MySQL connections with lifetime management."""
+
+    def __init__(self, size=5, idle_timeout=300, max_lifetime=3600,
+                 acquire_timeout=30, **connect_kwargs):
+        if size < 1:
+            raise ValueError("Pool size must be at least 1")
+        self.size = size
+        self.idle_timeout = idle_timeout
+        self.max_lifetime = max_lifetime
+        self.acquire_timeout = acquire_timeout
+        self.connect_kwargs = connect_kwargs or connect_args()
+        self.stats = {"connects": 0, "borrows": 0, "discarded": 0}
+        self._idle = []  # (connection, created_at, idle_since)
+        self._open = 0
+        self._lock = threading.Condition()
+
+    def _expired(self, created_at, idle_since, now):
+        return (
+            (self.max_lifetime and now - created_at > self.max_lifetime)
+            or (self.idle_timeout and now - idle_since > self.idle_timeout)
+        )
+
+    def _discard(self, connection):
+        with self._lock:
+            self._open -= 1
+            self.stats["discarded"] += 1
+            self._lock.notify()
+        try:
+            connection.close()
+        except mysql.connector.Error:
+            pass
+
+    def _take_idle(self):
+        """Pop idle connections until a healthy one turns up."""
+        while True:
+            with self._lock:
+                if not self._idle:
+                    return None
+                connection, created_at, idle_since = self._idle.pop()
+            if self._expired(created_at, idle_since, time.monotonic()):
+                self._discard(connection)
+            elif not connection.is_connected():
+                self._discard(connection)
+            else:
+                return connection, created_at
+
+    def acquire(self):
+        """Borrow a connection, waiting up to acquire_timeout for one."""
+        deadline = time.monotonic() + self.acquire_timeout
+        while True:
+            idle = self._take_idle()
+            if idle is not None:
+                with self._lock:
+                    self.stats["borrows"] += 1
+                return PooledConnection(self, *idle, fresh=False)
+            with self._lock:
+                if self._idle:
+                    continue
+                if self._open < self.size:
+                    self._open += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise PoolError(
+                        f"No connection available within "
+                        f"{self.acquire_timeout}s (pool size {self.size})"
+                    )
+                self._lock.wait(remaining)
+        try:
+            connection = mysql.connector.connect(**self.connect_kwargs)
+        except mysql.connector.Error:
+            with self._lock:
+                self._open -= 1
+                self._lock.notify()
+            raise
+        with self._lock:
+            self.stats["connects"] += 1
+            self.stats["borrows"] += 1
+        return PooledConnection(self, connection, time.monotonic(), True)
+
+    def release(self, connection, created_at):
+        """Return a connection to the idle list, or drop it if unusable."""
+        try:
+            # An abandoned streaming cursor leaves rows on the wire; dropping
+            # the connection is cheaper than draining them.
+            if connection.unread_result or not connection.is_connected():
+                raise mysql.connector.Error("connection not reusable")
+            if connection.in_transaction:
+                connection.rollback()
+        except mysql.connector.Error:
+            self._discard(connection)
+            return
+        with self._lock:
+            self._idle.append((connection, created_at, time.monotonic()))
+            self._lock.notify()
+
+    def close_all(self):
+        """Disconnect every idle connection."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for connection, _, _ in idle:
+            self._discard(connection)
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Return the process-wide pool, building it from the env on first use."""
+    global _pool, _pool_pid
+    with _pool_lock:
+        # Connections must not be shared across fork(); start a fresh pool
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = ConnectionPool(
+                size=int(os.environ.get("ALX_DB_POOL_SIZE", "5")),
+                idle_timeout=float(
+                    os.environ.get("ALX_DB_POOL_IDLE_TIMEOUT", "300")
+                ),
+                max_lifetime=float(
+                    os.environ.get("ALX_DB_POOL_MAX_LIFETIME", "3600")
+                ),
+                acquire_timeout=float(
+                    os.environ.get("ALX_DB_POOL_TIMEOUT", "30")
+                ),
+            )
+            _pool_pid = os.getpid()
+        return _pool
+
+
+def close_stream(cursor, connection=None):
+    """Close a streaming cursor, then hand `connection` back.
+
+    A consumer that stops a stream early leaves rows unread, and
+    mysql.connector then refuses to close the cursor ("Unread result
+    found"). The connection is released regardless; the pool sees the
+    unread result and drops it instead of reusing it.
+    """
+    try:
+        cursor.close()
+    except mysql.connector.Error:
+        pass
+    finally:
+        if connection is not None:
+            connection.close()
+
+
+def get_connection():
+    """Borrow a connection to ALX_prodev from the shared pool."""
+    return get_pool().acquire()
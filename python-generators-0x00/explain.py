@@ -0,0 +1,79 @@
+#!/usr/bin/python3
+"""EXPLAIN helper for the queries the user_data generators run.
+
+check_query() runs EXPLAIN and emits an UnindexedScanWarning when MySQL
+plans a full table scan for a query that filters or sorts, which means
+an index is missing. Queries that read the whole table on purpose can
+pass full_scan_ok=True.
+
+Usage: ./explain.py   (prints the plan of every generator query)
+"""
+import warnings
+import mysql.connector
+from db_pool import get_connection
+
+batch_processing = __import__('1-batch_processing')
+lazy_paginate = __import__('2-lazy_paginate')
+
+OVER_25 = batch_processing.Pipeline().where("age", ">", 25).sql()
+
+# (label, query, params, full_scan_ok)
+GENERATOR_QUERIES = [
+    ("stream_users", "SELECT * FROM user_data", (), True),
+    ("stream_user_ages", "SELECT age FROM user_data", (), True),
+    ("batch_processing", OVER_25[0], OVER_25[1], False),
+    ("lazy_paginate offset", lazy_paginate.OFFSET_QUERY, (100, 0), True),
+    ("lazy_paginate keyset", lazy_paginate.KEYSET_QUERY, ('', 100), False),
+    ("email lookup", "SELECT * FROM user_data WHERE email = %s",
+     ("someone@example.com",), False),
+]
+
+
+class UnindexedScanWarning(UserWarning):
+    """A filtering or sorting query is planned as a full table scan."""
+
+
+def explain(query, params=(), connection=None):
+    """Return the EXPLAIN rows for `query` as dicts."""
+    owns_connection = connection is None
+    if owns_connection:
+        connection = get_connection()
+    cursor = connection.cursor(dictionary=True)
+    try:
+        cursor.execute("EXPLAIN " + query, params)
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+        if owns_connection:
+            connection.close()
+
+
+def check_query(query, params=(), full_scan_ok=False, connection=None):
+    """EXPLAIN `query` and warn if it scans a table without an index."""
+    plan = explain(query, params, connection)
+    for step in plan:
+        if step.get("type") == "ALL" and not full_scan_ok:
+            warnings.warn(
+                f"Full scan of {step.get('table')} "
+                f"(~{step.get('rows')} rows) for: {query}",
+                UnindexedScanWarning, stacklevel=2
+            )
+    return plan
+
+
+def check_generator_queries(connection=None):
+    """Check every generator query; return {label: plan}."""
+    return {
+        label: check_query(query, params, full_scan_ok, connection)
+        for label, query, params, full_scan_ok in GENERATOR_QUERIES
+    }
+
+
+if __name__ == "__main__":
+    try:
+        for label, plan in check_generator_queries().items():
+            for step in plan:
+                print(f"{label:<22} type={str(step.get('type')):<6} "
+                      f"key={step.get('key')} rows={step.get('rows')}")
+    except mysql.connector.Error as err:
+        print(f"EXPLAIN failed: {err}")
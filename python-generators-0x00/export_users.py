@@ -0,0 +1,142 @@
+#!/usr/bin/python3
+"""Resumable export of user_data to rotating JSON Lines files.
+
+The table is walked in user_id order with keyset pagination. After every
+`checkpoint_every` pages the output file is fsynced and the last exported
+user_id, together with the current file and its length, is atomically
+written to checkpoint.json. On restart anything written after the last
+checkpoint is truncated away and the walk resumes after the recorded
+user_id, so every row lands in the output exactly once.
+
+Usage: ./export_users.py <out_dir> [page_size] [rows_per_file]
+"""
+import json
+import os
+import sys
+import mysql.connector
+
+lazy_paginate = __import__('2-lazy_paginate')
+
+CHECKPOINT = "checkpoint.json"
+
+
+def part_path(out_dir, index):
+    return os.path.join(out_dir, f"users-{index:05d}.jsonl")
+
+
+def load_checkpoint(out_dir):
+    """Return the saved checkpoint, or the state of a fresh export."""
+    try:
+        with open(os.path.join(out_dir, CHECKPOINT)) as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {"after_id": None, "file_index": 1, "file_rows": 0,
+                "file_offset": 0, "done": False}
+
+
+def save_checkpoint(out_dir, state):
+    """Atomically replace the checkpoint file with `state`."""
+    path = os.path.join(out_dir, CHECKPOINT)
+    tmp = path + ".tmp"
+    with open(tmp, "w") as file:
+        json.dump(state, file)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(tmp, path)
+
+
+def rollback_to(out_dir, state):
+    """Drop output written after the checkpoint described by `state`."""
+    index = state["file_index"]
+    path = part_path(out_dir, index)
+    if os.path.exists(path):
+        with open(path, "r+b") as file:
+            file.truncate(state["file_offset"])
+    later = index + 1
+    while os.path.exists(part_path(out_dir, later)):
+        os.remove(part_path(out_dir, later))
+        later += 1
+
+
+class RotatingSink:
+    """Append JSON lines, starting a new file every `rows_per_file` rows."""
+
+    def __init__(self, out_dir, rows_per_file, index, rows):
+        self.out_dir = out_dir
+        self.rows_per_file = rows_per_file
+        self.index = index
+        self.rows = rows
+        self.file = open(part_path(out_dir, index), "ab")
+
+    def write(self, row):
+        if self.rows >= self.rows_per_file:
+            self.sync()
+            self.file.close()
+            self.index += 1
+            self.rows = 0
+            self.file = open(part_path(self.out_dir, self.index), "ab")
+        self.file.write(json.dumps(row, default=str).encode() + b"\n")
+        self.rows += 1
+
+    def sync(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def close(self):
+        self.sync()
+        self.file.close()
+
+
+def commit(out_dir, sink, state):
+    """Make the sink durable, then record how far it got."""
+    sink.sync()
+    state.update(file_index=sink.index, file_rows=sink.rows,
+                 file_offset=sink.file.tell())
+    save_checkpoint(out_dir, state)
+
+
+def export_users(out_dir, page_size=1000, rows_per_file=100000,
+                 checkpoint_every=1):
+    """Export user_data into `out_dir`, resuming from its checkpoint.
+
+    Returns the number of rows written by this run.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    state = load_checkpoint(out_dir)
+    if state["done"]:
+        return 0
+    rollback_to(out_dir, state)
+    sink = RotatingSink(out_dir, rows_per_file,
+                        state["file_index"], state["file_rows"])
+    after_id = state["after_id"]
+    cursor = lazy_paginate.encode_cursor(after_id) if after_id else None
+    written = 0
+    pages = 0
+    try:
+        for page in lazy_paginate.lazy_paginate(
+            page_size, mode="keyset", cursor=cursor
+        ):
+            for row in page:
+                sink.write(row)
+            written += len(page)
+            pages += 1
+            state["after_id"] = page[-1]["user_id"]
+            if pages % checkpoint_every == 0:
+                commit(out_dir, sink, state)
+        state["done"] = True
+        commit(out_dir, sink, state)
+    finally:
+        sink.close()
+    return written
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print(__doc__.strip().splitlines()[-1])
+        sys.exit(1)
+    try:
+        rows = export_users(sys.argv[1],
+                            *(int(arg) for arg in sys.argv[2:4]))
+        print(f"Exported {rows} rows to {sys.argv[1]}")
+    except mysql.connector.Error as err:
+        print(f"Export failed, rerun to resume: {err}")
@@ -0,0 +1,119 @@
+#!/usr/bin/python3
+"""Range-partitioned parallel scan of user_data.
+
+The user_id keyspace (lowercase hex UUIDs) is split into N contiguous
+ranges on its first eight hex digits. Each range is streamed by its own
+worker thread over its own connection into a bounded queue, and the
+batches are merged back into a single row generator, either in user_id
+order or in whatever order they arrive.
+"""
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import db_pool
+from row_factories import make_row_factory
+
+_DONE = object()
+
+
+def key_ranges(partitions):
+    """Split the user_id keyspace into `partitions` (low, high) ranges.
+
+    The first range has no lower bound and the last no upper bound, so
+    ids outside the hex alphabet are still covered.
+    """
+    if partitions < 1:
+        raise ValueError("Need at least one partition")
+    bounds = [f"{i * 16 ** 8 // partitions:08x}" for i in range(1, partitions)]
+    return list(zip([None] + bounds, bounds + [None]))
+
+
+def range_query(low, high, ordered):
+    """Return the (query, params) pair that scans one key range."""
+    clauses = []
+    params = []
+    if low is not None:
+        clauses.append("user_id >= %s")
+        params.append(low)
+    if high is not None:
+        clauses.append("user_id < %s")
+        params.append(high)
+    query = "SELECT * FROM user_data"
+    if clauses:
+        query += " WHERE " + " AND ".join(clauses)
+    if ordered:
+        query += " ORDER BY user_id"
+    return query, tuple(params)
+
+
+def _put(buffer, item, stop):
+    """Block on a full queue until there is room or the scan is stopped."""
+    while not stop.is_set():
+        try:
+            buffer.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _scan_range(low, high, ordered, batch_size, buffer, stop):
+    """Stream one key range into `buffer` as lists of row dicts."""
+    try:
+        connection = db_pool.connect()
+        try:
+            cursor = connection.cursor()
+            cursor.execute(*range_query(low, high, ordered))
+            make_row = make_row_factory(
+                [col[0] for col in cursor.description]
+            )
+            while not stop.is_set():
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                batch = [make_row(row) for row in rows]
+                if not _put(buffer, batch, stop):
+                    break
+        finally:
+            # Closing the socket is cheaper than draining an abandoned scan
+            connection.close()
+        _put(buffer, _DONE, stop)
+    except Exception as err:
+        _put(buffer, err, stop)
+
+
+def partitioned_scan(workers=4, ordered=False, batch_size=1000, depth=4):
+    """Generator of user_data rows scanned by `workers` parallel ranges.
+
+    With ordered=True rows come out sorted by user_id; each range keeps
+    up to `depth` batches buffered while earlier ranges are drained.
+    Otherwise batches are yielded as soon as any worker produces them.
+    """
+    ranges = key_ranges(workers)
+    stop = threading.Event()
+    if ordered:
+        buffers = [queue.Queue(maxsize=depth) for _ in ranges]
+    else:
+        shared = queue.Queue(maxsize=depth * len(ranges))
+        buffers = [shared] * len(ranges)
+
+    pool = ThreadPoolExecutor(max_workers=len(ranges))
+    try:
+        for (low, high), buffer in zip(ranges, buffers):
+            pool.submit(_scan_range, low, high, ordered, batch_size,
+                        buffer, stop)
+        pending = len(ranges)
+        for buffer in (buffers if ordered else buffers[:1]):
+            while pending:
+                item = buffer.get()
+                if item is _DONE:
+                    pending -= 1
+                    if ordered:
+                        break
+                    continue
+                if isinstance(item, Exception):
+                    raise item
+                yield from item
+    finally:
+        stop.set()
+        pool.shutdown(wait=True)
@@ -0,0 +1,117 @@
+#!/usr/bin/python3
+"""Row factories that turn driver tuples into user_data rows.
+
+    "dict"    a fresh dict per row (the default, most flexible)
+    "tuple"   the driver's tuple as-is, no extra allocation
+    "record"  a __slots__ object with one attribute per column
+    "view"    ONE reusable object re-pointed at each new tuple; it is only
+              valid until the next row is produced, so copy what you keep
+
+Records and views support both row.age and row['age']. Every factory
+first applies the column converters from converters.py.
+"""
+import keyword
+from converters import make_row_converter
+
+_record_classes = {}
+
+
+class Record:
+    """Base class for the per-column-list __slots__ record classes."""
+
+    __slots__ = ()
+
+    def __getitem__(self, name):
+        return getattr(self, name)
+
+    def __iter__(self):
+        return (getattr(self, name) for name in self.__slots__)
+
+    def __eq__(self, other):
+        return type(other) is type(self) and tuple(self) == tuple(other)
+
+    def __repr__(self):
+        fields = ", ".join(
+            f"{name}={getattr(self, name)!r}" for name in self.__slots__
+        )
+        return f"{type(self).__name__}({fields})"
+
+    def asdict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+def record_class(columns):
+    """Return the (cached) __slots__ record class for a column list."""
+    columns = tuple(columns)
+    if columns not in _record_classes:
+        for name in columns:
+            if (not name.isidentifier() or keyword.iskeyword(name)
+                    or name.startswith("_")):
+                raise ValueError(f"Column {name!r} cannot be an attribute")
+        # Unrolled assignments beat a setattr loop on every row
+        source = "def __init__(self, row):\n" + "".join(
+            f"    self.{name} = row[{i}]\n" for i, name in enumerate(columns)
+        )
+        namespace = {}
+        exec(source, namespace)
+        _record_classes[columns] = type(
+            "UserRecord", (Record,),
+            {"__slots__": columns, "__init__": namespace["__init__"]}
+        )
+    return _record_classes[columns]
+
+
+class RowView:
+    """A reusable, read-only window onto the current row tuple."""
+
+    __slots__ = ("_index", "_row")
+
+    def __init__(self, columns):
+        self._index = {name: i for i, name in enumerate(columns)}
+        self._row = ()
+
+    def __getitem__(self, name):
+        return self._row[self._index[name]]
+
+    def __getattr__(self, name):
+        try:
+            return self._row[self._index[name]]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __iter__(self):
+        return iter(self._row)
+
+    def asdict(self):
+        return dict(zip(self._index, self._row))
+
+
+def make_row_factory(columns, kind="dict"):
+    """Return a callable converting one driver tuple into a row of `kind`.
+
+    Column values are decoded with the converters registered in
+    converters.py before the row is built.
+    """
+    factory = _base_factory(columns, kind)
+    convert = make_row_converter(columns)
+    if convert is None:
+        return factory
+    return lambda row: factory(convert(row))
+
+
+def _base_factory(columns, kind):
+    if kind == "dict":
+        columns = tuple(columns)
+        return lambda row: dict(zip(columns, row))
+    if kind == "tuple":
+        return tuple
+    if kind == "record":
+        return record_class(columns)
+    if kind == "view":
+        view = RowView(columns)
+
+        def point(row):
+            view._row = row
+            return view
+        return point
+    raise ValueError(f"Unknown row factory: {kind!r}")
@@ -0,0 +1,268 @@
+#!/usr/bin/python3
+"""Incremental, mergeable statistics over user ages.
+
+RunningStats keeps count, mean, variance (Welford), min and max plus a
+relative-error quantile sketch. Two instances built over different shards
+merge into the stats of the union. refresh() folds in only the rows whose
+watermark column is past the last value it saw and persists the result to
+a JSON state file, so repeated refreshes cost O(new rows).
+
+The watermark is user_data.seq, an invisible AUTO_INCREMENT column that
+seed.add_sequence_column() adds once to the table; the UUIDs in user_id
+do not grow with inserts, so they cannot serve as one.
+
+Usage: ./running_stats.py <state_file>
+"""
+import json
+import math
+import os
+import sys
+import mysql.connector
+from db_pool import close_stream, get_connection
+
+# Columns that grow with every insert; user_id is a UUID and does not
+WATERMARK_COLUMNS = ("seq",)
+VALUE_COLUMNS = ("age",)
+
+
+class QuantileSketch:
+    """DDSketch-style log-bucket histogram with bounded relative error.
+
+    Any quantile it returns is within `relative_accuracy` of a true value
+    at that rank. Sketches with the same accuracy merge exactly.
+    """
+
+    def __init__(self, relative_accuracy=0.01):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.positive = {}
+        self.negative = {}
+        self.zero = 0
+        self.count = 0
+
+    def _key(self, value):
+        return math.ceil(math.log(value) / self.log_gamma)
+
+    def _value(self, key):
+        return 2 * self.gamma ** key / (1 + self.gamma)
+
+    def add(self, value):
+        value = float(value)
+        if value > 0:
+            key = self._key(value)
+            self.positive[key] = self.positive.get(key, 0) + 1
+        elif value < 0:
+            key = self._key(-value)
+            self.negative[key] = self.negative.get(key, 0) + 1
+        else:
+            self.zero += 1
+        self.count += 1
+
+    def merge(self, other):
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Cannot merge sketches of different accuracy")
+        for mine, theirs in ((self.positive, other.positive),
+                             (self.negative, other.negative)):
+            for key, count in theirs.items():
+                mine[key] = mine.get(key, 0) + count
+        self.zero += other.zero
+        self.count += other.count
+
+    def quantile(self, q):
+        """Return the approximate q-quantile (0 <= q <= 1)."""
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = 0
+        for key in sorted(self.negative, reverse=True):
+            seen += self.negative[key]
+            if seen > rank:
+                return -self._value(key)
+        seen += self.zero
+        if seen > rank:
+            return 0.0
+        for key in sorted(self.positive):
+            seen += self.positive[key]
+            if seen > rank:
+                return self._value(key)
+        return self._value(max(self.positive))
+
+    def to_dict(self):
+        return {
+            "relative_accuracy": self.relative_accuracy,
+            "positive": {str(key): count
+                         for key, count in self.positive.items()},
+            "negative": {str(key): count
+                         for key, count in self.negative.items()},
+            "zero": self.zero,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data["relative_accuracy"])
+        sketch.positive = {int(k): v for k, v in data["positive"].items()}
+        sketch.negative = {int(k): v for k, v in data["negative"].items()}
+        sketch.zero = data["zero"]
+        sketch.count = (sum(sketch.positive.values())
+                        + sum(sketch.negative.values()) + sketch.zero)
+        return sketch
+
+
+class RunningStats:
+    """Count, mean, variance, min, max and quantiles, updated row by row."""
+
+    def __init__(self, relative_accuracy=0.01):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = None
+        self.max = None
+        self.sketch = QuantileSketch(relative_accuracy)
+
+    def add(self, value):
+        value = float(value)
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+        self.sketch.add(value)
+
+    def update(self, values):
+        for value in values:
+            self.add(value)
+        return self
+
+    def merge(self, other):
+        """Fold another shard's stats into this one."""
+        if not other.count:
+            return self
+        if not self.count:
+            self.count, self.mean, self.m2 = other.count, other.mean, other.m2
+            self.min, self.max = other.min, other.max
+        else:
+            count = self.count + other.count
+            delta = other.mean - self.mean
+            self.mean += delta * other.count / count
+            self.m2 += (other.m2
+                        + delta * delta * self.count * other.count / count)
+            self.count = count
+            self.min = min(self.min, other.min)
+            self.max = max(self.max, other.max)
+        self.sketch.merge(other.sketch)
+        return self
+
+    @property
+    def variance(self):
+        """Sample variance (0.0 with fewer than two values)."""
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    @property
+    def stddev(self):
+        return math.sqrt(self.variance)
+
+    def quantile(self, q):
+        return self.sketch.quantile(q)
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean": self.mean,
+            "variance": self.variance,
+            "min": self.min,
+            "max": self.max,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+        }
+
+    def to_dict(self):
+        return {"count": self.count, "mean": self.mean, "m2": self.m2,
+                "min": self.min, "max": self.max,
+                "sketch": self.sketch.to_dict()}
+
+    @classmethod
+    def from_dict(cls, data):
+        stats = cls()
+        stats.count, stats.mean, stats.m2 = (
+            data["count"], data["mean"], data["m2"]
+        )
+        stats.min, stats.max = data["min"], data["max"]
+        stats.sketch = QuantileSketch.from_dict(data["sketch"])
+        return stats
+
+
+def stream_new_values(watermark, watermark_column="seq", column="age"):
+    """Generator of (watermark, value) pairs for rows past `watermark`."""
+    if watermark_column not in WATERMARK_COLUMNS:
+        raise ValueError(f"Cannot use {watermark_column!r} as a watermark")
+    if column not in VALUE_COLUMNS:
+        raise ValueError(f"Cannot aggregate column {column!r}")
+    connection = get_connection()
+    cursor = connection.cursor()
+
+    try:
+        cursor.execute(
+            f"SELECT {watermark_column}, {column} FROM user_data "
+            f"WHERE {watermark_column} > %s ORDER BY {watermark_column}",
+            (watermark or 0,)
+        )
+        for row in cursor:
+            yield row
+    finally:
+        close_stream(cursor, connection)
+
+
+def load_state(path, watermark_column="seq"):
+    """Return (watermark, RunningStats) saved at `path`, or a fresh pair.
+
+    A state file whose watermark was taken from another column (files
+    written before seq existed used user_id) is refused: its stats are
+    missing rows and must be rebuilt from an empty state.
+    """
+    try:
+        with open(path) as file:
+            data = json.load(file)
+    except FileNotFoundError:
+        return None, RunningStats()
+    saved_column = data.get("watermark_column", "user_id")
+    if saved_column != watermark_column:
+        raise ValueError(
+            f"{path} was refreshed on {saved_column!r}, not "
+            f"{watermark_column!r}; delete it to rebuild the stats"
+        )
+    return data["watermark"], RunningStats.from_dict(data["stats"])
+
+
+def save_state(path, watermark, stats, watermark_column="seq"):
+    tmp = path + ".tmp"
+    with open(tmp, "w") as file:
+        json.dump({"watermark_column": watermark_column,
+                   "watermark": watermark, "stats": stats.to_dict()}, file)
+    os.replace(tmp, path)
+
+
+def refresh(path, watermark_column="seq", column="age"):
+    """Fold rows added since the last refresh into the stats at `path`."""
+    if watermark_column not in WATERMARK_COLUMNS:
+        raise ValueError(f"Cannot use {watermark_column!r} as a watermark")
+    watermark, stats = load_state(path, watermark_column)
+    for watermark, value in stream_new_values(
+        watermark, watermark_column, column
+    ):
+        stats.add(value)
+    save_state(path, watermark, stats, watermark_column)
+    return stats
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print(__doc__.split("Usage: ")[1].strip())
+        sys.exit(1)
+    try:
+        for name, value in refresh(sys.argv[1]).summary().items():
+            print(f"{name:>8}: {value}")
+    except (mysql.connector.Error, ValueError) as err:
+        print(f"Refresh failed: {err}")
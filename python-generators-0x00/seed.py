@@ -1,15 +1,45 @@
 import mysql.connector
 import csv
 import os
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+import db_pool
+
+# Secondary indexes on user_data. The composite (age, email) index also
+# serves plain age predicates, so age needs no index of its own.
+INDEXES = {
+    "idx_user_data_email": "(email)",
+    "idx_user_data_age_email": "(age, email)",
+}
+
+# user_id for CSV rows that have none: uuid5 of the email's mailto: URL,
+# so seeding the same file again maps every row onto its existing id.
+USER_ID_NAMESPACE = uuid.NAMESPACE_URL
+
+def user_id_for(email):
+    """Deterministic user_id for a user known only by email."""
+    return str(uuid.uuid5(USER_ID_NAMESPACE, f"mailto:{email}"))
+
+def user_id_sql(email):
+    """SQL expression computing user_id_for() of the `email` expression.
+
+    Spells out uuid5 (SHA-1 of namespace + name, version and variant
+    bits set) so LOAD DATA assigns the same ids as the Python path.
+    """
+    digest = (f"SHA1(CONCAT(UNHEX('{USER_ID_NAMESPACE.hex}'), "
+              f"'mailto:', {email}))")
+    return (
+        f"LOWER(CONCAT(SUBSTR({digest}, 1, 8), '-', SUBSTR({digest}, 9, 4), "
+        f"'-5', SUBSTR({digest}, 14, 3), '-', "
+        f"HEX(CONV(SUBSTR({digest}, 17, 1), 16, 10) & 3 | 8), "
+        f"SUBSTR({digest}, 18, 3), '-', SUBSTR({digest}, 21, 12)))"
+    )
 
 def connect_db():
     """Connect to the MySQL database server."""
     try:
-        connection = mysql.connector.connect(
-            host="localhost",
-            user="root",
-            password=""
-        )
+        connection = db_pool.connect(database=False)
         return connection
     except mysql.connector.Error as err:
         print(f"Error connecting to MySQL: {err}")
@@ -26,14 +56,9 @@ def create_database(connection):
         print(f"Error creating database: {err}")
 
 def connect_to_prodev():
-    """Connect to the ALX_prodev database."""
+    """Borrow a connection to the ALX_prodev database from the pool."""
     try:
-        connection = mysql.connector.connect(
-            host="localhost",
-            user="root",
-            password="",
-            database="ALX_prodev"
-        )
+        connection = db_pool.get_connection()
         return connection
     except mysql.connector.Error as err:
         print(f"Error connecting to ALX_prodev: {err}")
@@ -46,7 +71,7 @@ def create_table(connection):
         user_id CHAR(36) PRIMARY KEY,
         name VARCHAR(50) NOT NULL,
         email VARCHAR(100) NOT NULL,
-        age DECIMAL NOT NULL
+        age TINYINT UNSIGNED NOT NULL
     )
     """
     try:
@@ -58,6 +83,101 @@ def create_table(connection):
     except mysql.connector.Error as err:
         print(f"Error creating table: {err}")
 
+def migrate_age_to_int(connection):
+    """Convert a legacy DECIMAL age column to TINYINT UNSIGNED in place.
+
+    Returns True if the column was altered, False if it already was an
+    integer type.
+    """
+    try:
+        cursor = connection.cursor()
+        cursor.execute(
+            "SELECT DATA_TYPE FROM information_schema.COLUMNS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'user_data' "
+            "AND COLUMN_NAME = 'age'"
+        )
+        row = cursor.fetchone()
+        if row is None or row[0].lower() != "decimal":
+            cursor.close()
+            return False
+        cursor.execute(
+            "ALTER TABLE user_data MODIFY age TINYINT UNSIGNED NOT NULL"
+        )
+        cursor.close()
+        print("Column user_data.age migrated to TINYINT UNSIGNED")
+        return True
+    except mysql.connector.Error as err:
+        print(f"Error migrating age column: {err}")
+        return False
+
+def add_sequence_column(connection):
+    """Add the invisible AUTO_INCREMENT seq column to user_data.
+
+    seq grows with every insert, unlike the UUIDs in user_id, so
+    running_stats.refresh() uses it as its watermark; run this once
+    before the first refresh. It is not part of create_table() because
+    INVISIBLE needs MySQL 8.0.23+. Existing rows are numbered when the
+    column is added, and INVISIBLE keeps it out of SELECT * and of
+    INSERTs without a column list. Returns True if the column was added.
+    """
+    try:
+        cursor = connection.cursor()
+        cursor.execute(
+            "SELECT 1 FROM information_schema.COLUMNS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'user_data' "
+            "AND COLUMN_NAME = 'seq'"
+        )
+        if cursor.fetchone() is not None:
+            cursor.close()
+            return False
+        cursor.execute(
+            "ALTER TABLE user_data ADD COLUMN seq BIGINT UNSIGNED NOT NULL "
+            "AUTO_INCREMENT INVISIBLE UNIQUE"
+        )
+        cursor.close()
+        print("Column user_data.seq added")
+        return True
+    except mysql.connector.Error as err:
+        print(f"Error adding seq column: {err}")
+        return False
+
+def existing_indexes(connection):
+    """Return the names of the secondary indexes present on user_data."""
+    cursor = connection.cursor()
+    cursor.execute(
+        "SELECT DISTINCT INDEX_NAME FROM information_schema.STATISTICS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'user_data' "
+        "AND INDEX_NAME <> 'PRIMARY'"
+    )
+    names = {name for (name,) in cursor.fetchall()}
+    cursor.close()
+    return names
+
+def create_indexes(connection):
+    """Create any missing secondary indexes listed in INDEXES."""
+    try:
+        present = existing_indexes(connection)
+        cursor = connection.cursor()
+        for name, columns in INDEXES.items():
+            if name not in present:
+                cursor.execute(f"CREATE INDEX {name} ON user_data {columns}")
+                print(f"Index {name} created")
+        cursor.close()
+    except mysql.connector.Error as err:
+        print(f"Error creating indexes: {err}")
+
+def drop_indexes(connection):
+    """Drop the secondary indexes listed in INDEXES, e.g. before a bulk load."""
+    try:
+        present = existing_indexes(connection)
+        cursor = connection.cursor()
+        for name in INDEXES:
+            if name in present:
+                cursor.execute(f"DROP INDEX {name} ON user_data")
+        cursor.close()
+    except mysql.connector.Error as err:
+        print(f"Error dropping indexes: {err}")
+
 def insert_data(connection, csv_path):
     """Insert data from CSV into user_data, ignoring duplicates."""
     try:
@@ -83,4 +203,217 @@ def insert_data(connection, csv_path):
     except mysql.connector.Error as err:
         print(f"Error inserting data: {err}")
     except FileNotFoundError:
-        print(f"Error: CSV file {csv_path} not found")
\ No newline at end of file
+        print(f"Error: CSV file {csv_path} not found")
+
+def parse_user_rows(lines):
+    """Turn CSV lines into (user_id, name, email, age) tuples.
+
+    Accepts files with or without a user_id column and skips the header
+    row and malformed lines. Rows without a user_id get user_id_for()
+    their email, so reseeding a file does not duplicate its users.
+    """
+    for row in csv.reader(lines):
+        if len(row) == 3:
+            row = [user_id_for(row[1])] + row
+        elif len(row) != 4:
+            continue
+        if row[-1] == "age":
+            continue
+        yield tuple(row)
+
+def read_user_rows(csv_path):
+    """Stream user tuples from a users CSV without loading it whole."""
+    with open(csv_path, 'r', newline='') as file:
+        yield from parse_user_rows(file)
+
+def chunked(rows, chunk_size):
+    """Group an iterable of rows into lists of at most `chunk_size`."""
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def insert_chunks(connection, rows, chunk_size):
+    """Insert user tuples with one executemany and commit per chunk."""
+    inserted = 0
+    cursor = connection.cursor()
+    # INSERT IGNORE defeats the driver's multi-row rewrite, so skip
+    # duplicates with a no-op ON DUPLICATE KEY UPDATE instead.
+    query = (
+        "INSERT INTO user_data (user_id, name, email, age) "
+        "VALUES (%s, %s, %s, %s) "
+        "ON DUPLICATE KEY UPDATE user_id = user_id"
+    )
+    try:
+        for chunk in chunked(rows, chunk_size):
+            cursor.executemany(query, chunk)
+            connection.commit()
+            # rows matching an existing key report 0 affected rows
+            inserted += max(cursor.rowcount, 0)
+    finally:
+        cursor.close()
+    return inserted
+
+def bulk_insert_data(connection, csv_path, chunk_size=1000,
+                     use_load_data=False, defer_indexes=False):
+    """Insert CSV rows into user_data in batches, committing per chunk.
+
+    Rows are streamed from the file and sent with executemany, which the
+    driver rewrites into one multi-row INSERT per chunk. With
+    use_load_data=True the file is handed to LOAD DATA LOCAL INFILE
+    instead. defer_indexes=True drops the secondary indexes for the load
+    and rebuilds them afterwards. Returns a dict with the row count,
+    elapsed seconds and rows/sec.
+    """
+    if defer_indexes:
+        drop_indexes(connection)
+    try:
+        if use_load_data:
+            return load_data_infile(csv_path)
+        start = time.perf_counter()
+        inserted = 0
+        try:
+            inserted = insert_chunks(
+                connection, read_user_rows(csv_path), chunk_size
+            )
+        except mysql.connector.Error as err:
+            print(f"Error inserting data: {err}")
+        except FileNotFoundError:
+            print(f"Error: CSV file {csv_path} not found")
+        return report_load(inserted, time.perf_counter() - start)
+    finally:
+        if defer_indexes:
+            create_indexes(connection)
+
+def load_data_infile(csv_path):
+    """Load a users CSV with LOAD DATA LOCAL INFILE on its own connection."""
+    start = time.perf_counter()
+    loaded = 0
+    try:
+        with open(csv_path, 'r', newline='') as file:
+            first = next(csv.reader(file), [])
+        header = 1 if first and first[-1] == "age" else 0
+        if len(first) == 3:
+            columns = (f"(name, @email, age) SET email = @email, "
+                       f"user_id = {user_id_sql('@email')}")
+        else:
+            columns = "(user_id, name, email, age)"
+        connection = mysql.connector.connect(
+            allow_local_infile=True, **db_pool.connect_args()
+        )
+        cursor = connection.cursor()
+        cursor.execute(
+            "LOAD DATA LOCAL INFILE %s IGNORE INTO TABLE user_data "
+            "FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '\"' "
+            "LINES TERMINATED BY '\\n' "
+            f"IGNORE {header} LINES {columns}",
+            (os.path.abspath(csv_path),)
+        )
+        loaded = cursor.rowcount
+        connection.commit()
+        cursor.close()
+        connection.close()
+    except mysql.connector.Error as err:
+        print(f"Error loading data: {err}")
+    except FileNotFoundError:
+        print(f"Error: CSV file {csv_path} not found")
+    return report_load(loaded, time.perf_counter() - start)
+
+def report_load(rows, seconds):
+    """Print and return the throughput of a load."""
+    rate = rows / seconds if seconds else 0.0
+    print(f"Inserted {rows} rows in {seconds:.2f}s ({rate:,.0f} rows/sec)")
+    return {"rows": rows, "seconds": seconds, "rows_per_sec": rate}
+
+def shard_ranges(csv_path, shards):
+    """Split a file into byte ranges that start and end on line boundaries.
+
+    Each line belongs to the range containing its first byte. Quoted CSV
+    fields must not contain newlines.
+    """
+    size = os.path.getsize(csv_path)
+    bounds = [0]
+    with open(csv_path, 'rb') as file:
+        for i in range(1, shards):
+            file.seek(max(size * i // shards, bounds[-1]))
+            if file.tell() > 0:
+                file.seek(file.tell() - 1)
+            file.readline()
+            bounds.append(file.tell())
+    bounds.append(size)
+    return [(start, end) for start, end in zip(bounds, bounds[1:])
+            if end > start]
+
+def read_shard_lines(csv_path, start, end):
+    """Yield the decoded lines that begin inside [start, end)."""
+    with open(csv_path, 'rb') as file:
+        file.seek(start)
+        while file.tell() < end:
+            line = file.readline()
+            if not line:
+                break
+            yield line.decode('utf-8')
+
+def seed_shard(csv_path, start, end, chunk_size):
+    """Parse and insert one shard on a dedicated connection."""
+    began = time.perf_counter()
+    connection = db_pool.connect()
+    try:
+        rows = parse_user_rows(read_shard_lines(csv_path, start, end))
+        inserted = insert_chunks(connection, rows, chunk_size)
+    finally:
+        connection.close()
+    return {
+        "start": start,
+        "end": end,
+        "rows": inserted,
+        "seconds": time.perf_counter() - began,
+    }
+
+def parallel_insert_data(csv_path, workers=None, chunk_size=1000,
+                         defer_indexes=False):
+    """Seed user_data from a CSV with one process per byte-range shard.
+
+    Every worker parses its own slice of the file and inserts it over its
+    own connection, committing per chunk. defer_indexes=True drops the
+    secondary indexes for the load and rebuilds them afterwards. Returns
+    the merged load stats plus a "shards" list with each worker's rows
+    and seconds. A shard that fails is reported with its "error" and 0
+    rows; the rows the other shards committed are still counted.
+    """
+    workers = workers or os.cpu_count() or 1
+    start = time.perf_counter()
+    shards = []
+    if defer_indexes:
+        connection = connect_to_prodev()
+        drop_indexes(connection)
+    try:
+        ranges = shard_ranges(csv_path, workers)
+        with ProcessPoolExecutor(max_workers=len(ranges) or 1) as pool:
+            futures = [
+                pool.submit(seed_shard, csv_path, begin, end, chunk_size)
+                for begin, end in ranges
+            ]
+            for (begin, end), future in zip(ranges, futures):
+                try:
+                    shards.append(future.result())
+                except (mysql.connector.Error, OSError) as err:
+                    print(f"Error inserting shard {begin}-{end}: {err}")
+                    shards.append({"start": begin, "end": end, "rows": 0,
+                                   "seconds": None, "error": str(err)})
+    except FileNotFoundError:
+        print(f"Error: CSV file {csv_path} not found")
+    finally:
+        if defer_indexes:
+            create_indexes(connection)
+            connection.close()
+    stats = report_load(
+        sum(shard["rows"] for shard in shards),
+        time.perf_counter() - start
+    )
+    stats["shards"] = shards
+    return stats
@@ -0,0 +1,409 @@
+#!/usr/bin/env python3
+"""Tests for the user_data streams.
+
+The pool tests use fake connections that behave like mysql.connector's
+unbuffered ones: closing a cursor with rows left raises "Unread result
+found". When mysql-connector-python is not installed, a minimal
+stand-in for the parts db_pool uses is registered so the pool logic
+still runs. The async tests use the ALX_DB_ASYNC=sqlite backend and
+need aiosqlite.
+"""
+import asyncio
+import os
+import sqlite3
+import sys
+import tempfile
+import types
+import unittest
+from decimal import Decimal
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from unittest.mock import patch
+
+try:
+    import mysql.connector
+    from mysql.connector.errors import InternalError, ProgrammingError
+except ImportError:
+    class Error(Exception):
+        pass
+
+    class PoolError(Error):
+        pass
+
+    class InternalError(Error):
+        pass
+
+    class ProgrammingError(Error):
+        pass
+
+    errors = types.ModuleType("mysql.connector.errors")
+    errors.Error, errors.PoolError, errors.InternalError = (
+        Error, PoolError, InternalError
+    )
+    errors.ProgrammingError = ProgrammingError
+    connector = types.ModuleType("mysql.connector")
+    connector.Error, connector.errors = Error, errors
+    connector.connect = None
+    mysql = types.ModuleType("mysql")
+    mysql.connector = connector
+    sys.modules.update({
+        "mysql": mysql,
+        "mysql.connector": connector,
+        "mysql.connector.errors": errors,
+    })
+
+import async_streams
+import db_pool
+import running_stats
+import seed
+
+stream_users = __import__('0-stream_users').stream_users
+batch_processing = __import__('1-batch_processing')
+stream_ages = __import__('4-stream_ages')
+
+ROWS = [(f"id-{i:03}", f"user {i}", f"user{i}@example.com", 20 + i % 50)
+        for i in range(100)]
+DESCRIPTION = [(name,) for name in ("user_id", "name", "email", "age")]
+
+
+class FakeCursor:
+    def __init__(self, connection):
+        self.connection = connection
+        self.description = None
+        self._rows = iter(())
+
+    def execute(self, query, params=()):
+        self.description = DESCRIPTION
+        self._rows = iter(ROWS)
+        self.connection.unread_result = True
+
+    def _next(self):
+        row = next(self._rows, None)
+        if row is None:
+            self.connection.unread_result = False
+        return row
+
+    def __iter__(self):
+        while True:
+            row = self._next()
+            if row is None:
+                return
+            yield row
+
+    def fetchmany(self, size):
+        rows = []
+        while len(rows) < size:
+            row = self._next()
+            if row is None:
+                break
+            rows.append(row)
+        return rows
+
+    def close(self):
+        if self.connection.unread_result:
+            raise InternalError("Unread result found")
+
+
+class FakeConnection:
+    def __init__(self, **kwargs):
+        self.unread_result = False
+        self.in_transaction = False
+        self.connected = True
+
+    def cursor(self, *args, **kwargs):
+        return FakeCursor(self)
+
+    def is_connected(self):
+        return self.connected
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.connected = False
+
+
+class TestEarlyClose(unittest.TestCase):
+    def setUp(self):
+        self.pool = db_pool.ConnectionPool(size=2, acquire_timeout=0.2,
+                                           host="fake")
+        patches = [
+            patch.object(db_pool.mysql.connector, "connect", FakeConnection,
+                         create=True),
+            patch.object(db_pool, "get_pool", return_value=self.pool),
+        ]
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_stream_users_closed_early_releases_connection(self):
+        """Breaking out of more streams than the pool holds never blocks"""
+        for _ in range(self.pool.size * 3):
+            for _ in islice(stream_users(), 3):
+                pass
+        self.assertEqual(self.pool._open, 0)
+        self.assertEqual(self.pool.stats["discarded"], self.pool.size * 3)
+
+    def test_batches_closed_early_releases_connection(self):
+        """gen.close() on a half-read batch stream returns the connection"""
+        for _ in range(self.pool.size * 3):
+            batches = batch_processing.stream_users_in_batches(10)
+            next(batches)
+            batches.close()
+        self.assertEqual(self.pool._open, 0)
+
+    def test_read_ahead_closed_early_releases_connection(self):
+        """Closing a read-ahead stream early stops the thread cleanly"""
+        for _ in range(self.pool.size * 3):
+            batches = batch_processing.stream_users_read_ahead(10, depth=2)
+            next(batches)
+            batches.close()
+        self.assertEqual(self.pool._open, 0)
+
+    def test_read_ahead_ignores_close_errors(self):
+        """An error from closing the source does not escape the thread"""
+        def source():
+            try:
+                yield from ([1], [2], [3])
+            finally:
+                raise InternalError("Unread result found")
+
+        hook = []
+        with patch("threading.excepthook", lambda args: hook.append(args)):
+            batches = batch_processing.read_ahead(source(), depth=1)
+            self.assertEqual(next(batches), [1])
+            batches.close()
+        self.assertEqual(hook, [])
+
+    def failing_execute(self):
+        """Make every query fail the way an unknown column does."""
+        def execute(cursor, query, params=()):
+            raise ProgrammingError("Unknown column in 'field list'")
+        return patch.object(FakeCursor, "execute", execute)
+
+    def test_failed_query_releases_connection(self):
+        """A query that raises still hands its connection back"""
+        with self.failing_execute():
+            for _ in range(self.pool.size * 3):
+                with self.assertRaises(ProgrammingError):
+                    next(batch_processing.stream_users_in_batches(10))
+        self.assertEqual(len(self.pool._idle), 1)
+        self.assertEqual(self.pool.stats["connects"], 1)
+
+    @unittest.skipIf(batch_processing.np is None, "numpy not installed")
+    def test_failed_columnar_query_releases_connection(self):
+        """stream_users_in_columns hands its connection back on failure"""
+        with self.failing_execute():
+            for _ in range(self.pool.size * 3):
+                with self.assertRaises(ProgrammingError):
+                    next(batch_processing.stream_users_in_columns(10))
+        self.assertEqual(len(self.pool._idle), 1)
+
+    def test_failed_refresh_query_releases_connection(self):
+        """A refresh on a table without seq does not use up the pool"""
+        with self.failing_execute():
+            for _ in range(self.pool.size * 3):
+                with self.assertRaises(ProgrammingError):
+                    next(running_stats.stream_new_values(None))
+        self.assertEqual(len(self.pool._idle), 1)
+
+    def test_failed_column_query_releases_connection(self):
+        """stream_column hands its connection back when the query fails"""
+        with self.failing_execute():
+            for _ in range(self.pool.size * 3):
+                with self.assertRaises(ProgrammingError):
+                    next(stream_ages.stream_column("age"))
+        self.assertEqual(len(self.pool._idle), 1)
+
+    def test_fully_read_stream_is_reused(self):
+        """A stream read to the end leaves a reusable connection behind"""
+        self.assertEqual(len(list(stream_users())), len(ROWS))
+        self.assertEqual(len(list(stream_users())), len(ROWS))
+        self.assertEqual(self.pool.stats["connects"], 1)
+        self.assertEqual(self.pool.stats["discarded"], 0)
+
+
+class TestAggregate(unittest.TestCase):
+    AGES = [35, 99, 20, 41]
+
+    def connection(self):
+        """A connection answering both the pushed-down and streamed queries."""
+        ages = self.AGES
+
+        class Cursor:
+            def execute(self, query, params=()):
+                self.query = query
+
+            def fetchone(self):
+                # what the driver returns for SUM/AVG/MIN/MAX of a TINYINT
+                return {"sum": Decimal(sum(ages)), "avg": Decimal("48.75"),
+                        "min": min(ages), "max": max(ages)}[self.query[7:10].lower()],
+
+            def __iter__(self):
+                return iter([(age,) for age in ages])
+
+            def close(self):
+                pass
+
+        class Connection:
+            def cursor(self):
+                return Cursor()
+
+        return Connection()
+
+    def test_pushdown_matches_streaming(self):
+        """Pushed-down results have the same values and types as streamed"""
+        for name in ("sum", "avg", "min", "max"):
+            pushed = stream_ages.aggregate([name], connection=self.connection())
+            streamed = stream_ages.aggregate([name], pushdown=False,
+                                             connection=self.connection())
+            self.assertEqual(pushed, streamed)
+            self.assertIs(type(pushed[name]), type(streamed[name]))
+        self.assertIs(type(pushed["max"]), int)
+
+
+class TestSeedRows(unittest.TestCase):
+    CSV = ['"name","email","age"\n',
+           '"Johnnie Mayer","Ross.Reynolds21@hotmail.com","35"\n',
+           '"Myrtle Waters","Edmund_Funk@gmail.com","99"\n']
+
+    def test_generated_ids_are_stable(self):
+        """Rows without a user_id get the same id on every run"""
+        first = list(seed.parse_user_rows(self.CSV))
+        self.assertEqual(first, list(seed.parse_user_rows(self.CSV)))
+        self.assertEqual(first[0][0],
+                         seed.user_id_for("Ross.Reynolds21@hotmail.com"))
+        self.assertEqual(len({row[0] for row in first}), 2)
+
+    def test_insert_chunks_counts_affected_rows(self):
+        """Rows skipped as duplicates are not counted as inserted"""
+        class Cursor:
+            rowcount = -1
+
+            def executemany(self, query, chunk):
+                self.rowcount = len(chunk) - 1  # one duplicate per chunk
+
+            def close(self):
+                pass
+
+        class Connection:
+            def cursor(self):
+                return Cursor()
+
+            def commit(self):
+                pass
+
+        rows = list(seed.parse_user_rows(self.CSV)) * 2
+        self.assertEqual(seed.insert_chunks(Connection(), rows, 2), 2)
+
+    def test_parallel_insert_keeps_shards_that_succeeded(self):
+        """One failing shard does not hide the rows the others committed"""
+        handle, path = tempfile.mkstemp(suffix=".csv")
+        with os.fdopen(handle, "w") as file:
+            file.writelines(self.CSV * 4)
+        self.addCleanup(os.remove, path)
+
+        def seed_shard(csv_path, start, end, chunk_size):
+            if start == 0:
+                raise ProgrammingError("Table 'user_data' is full")
+            return {"start": start, "end": end, "rows": 3, "seconds": 0.1}
+
+        with patch.object(seed, "ProcessPoolExecutor", ThreadPoolExecutor), \
+                patch.object(seed, "seed_shard", seed_shard), \
+                patch("builtins.print"):
+            stats = seed.parallel_insert_data(path, workers=3)
+        self.assertEqual(len(stats["shards"]), 3)
+        self.assertEqual(stats["rows"], 6)
+        self.assertIn("full", stats["shards"][0]["error"])
+
+
+@unittest.skipIf(async_streams.aiosqlite is None, "aiosqlite not installed")
+class TestAsyncStreams(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix=".db")
+        os.close(handle)
+        self.addCleanup(os.remove, self.path)
+        with sqlite3.connect(self.path) as conn:
+            conn.execute("CREATE TABLE user_data (user_id TEXT PRIMARY KEY, "
+                         "name TEXT, email TEXT, age INTEGER)")
+            conn.executemany("INSERT INTO user_data VALUES (?, ?, ?, ?)",
+                             ROWS)
+        patcher = patch.dict(os.environ, {"ALX_DB_ASYNC": "sqlite",
+                                          "ALX_DB_SQLITE_PATH": self.path})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def test_stream_users_reads_every_row(self):
+        """The sqlite backend yields every row as a dict"""
+        rows = [row async for row in async_streams.stream_users(7)]
+        self.assertEqual([row["user_id"] for row in rows],
+                         [row[0] for row in ROWS])
+
+    async def test_prefetch_backpressure(self):
+        """A slow consumer never lets more than `depth` items pile up"""
+        produced = []
+
+        async def source():
+            for i in range(100):
+                produced.append(i)
+                yield i
+
+        depth = 3
+        stream = async_streams.prefetch(source(), depth)
+        self.assertEqual(await stream.__anext__(), 0)
+        await asyncio.sleep(0.05)
+        # one delivered, `depth` queued, one waiting on the full queue
+        self.assertLessEqual(len(produced), depth + 2)
+        await stream.aclose()
+
+    async def test_prefetch_early_aclose_closes_source(self):
+        """aclose() stops the read-ahead task and closes the source"""
+        closed = []
+
+        async def source():
+            try:
+                for i in range(100):
+                    yield i
+            finally:
+                closed.append(True)
+
+        stream = async_streams.prefetch(source(), 2)
+        await stream.__anext__()
+        await stream.aclose()
+        self.assertEqual(closed, [True])
+
+    async def test_batches_early_aclose_closes_connection(self):
+        """Leaving a read-ahead batch stream early closes its connection"""
+        closes = []
+        real_close = async_streams._close
+
+        async def counting_close(connection):
+            closes.append(connection)
+            await real_close(connection)
+
+        with patch.object(async_streams, "_close", counting_close):
+            stream = async_streams.stream_users_in_batches(10, 2)
+            self.assertEqual(len(await stream.__anext__()), 10)
+            await stream.aclose()
+        self.assertEqual(len(closes), 1)
+
+    async def test_keyset_resume(self):
+        """Resuming keyset pagination after a page continues without gaps"""
+        first = []
+        pages = async_streams.lazy_paginate(7, mode="keyset")
+        async for page in pages:
+            first.extend(page)
+            if len(first) >= 14:
+                break
+        await pages.aclose()
+        rest = []
+        async for page in async_streams.lazy_paginate(
+            7, mode="keyset", after_id=first[-1]["user_id"]
+        ):
+            rest.extend(page)
+        ids = [row["user_id"] for row in first + rest]
+        self.assertEqual(ids, sorted(row[0] for row in ROWS))
+
+
+if __name__ == "__main__":
+    unittest.main()